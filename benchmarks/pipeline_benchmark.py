@@ -0,0 +1,225 @@
+"""
+Benchmark de ponta a ponta do pipeline de propostas, sem acesso à rede.
+
+Gera um corpus sintético, roda extração -> análise (backend local de IA) -> banco -> notificação
+(servidor HTTP local no lugar do CallMeBot) e salva as métricas em JSON.
+
+Uso:
+    python -m benchmarks.pipeline_benchmark --files 50 --max-pages 40 --llm-latency-ms 200
+    python -m benchmarks.pipeline_benchmark --compare benchmarks/results/anterior.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from benchmarks.synthetic_corpus import generate_corpus
+from src.core import database_service as database
+from src.core import llm_backend
+from src.core import llm_cache
+from src.core import notification_dispatcher
+from src.core import notification_service as notifier
+from src.core import pdf_extractor
+from src.core import proposal_processor as analysis_processor
+
+RESULTS_DIR = Path(project_root) / "benchmarks" / "results"
+STAGES = ["extracao", "analise", "banco", "notificacao", "total"]
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Substituto local da API do CallMeBot: responde 200 a qualquer GET."""
+
+    def do_GET(self):
+        body = b"Message queued. You will receive it in a few seconds."
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_notification_stand_in():
+    """Sobe o servidor HTTP local e retorna (servidor, url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/whatsapp.php"
+
+
+def percentile(values, pct):
+    """Percentil pelo método do posto mais próximo."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(values):
+    """Estatísticas de latência (em milissegundos) de uma etapa."""
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else None,
+        "p50_ms": round(percentile(values, 50) * 1000, 3) if values else None,
+        "p95_ms": round(percentile(values, 95) * 1000, 3) if values else None,
+        "p99_ms": round(percentile(values, 99) * 1000, 3) if values else None,
+    }
+
+
+def peak_rss_mb():
+    """Pico de memória residente do processo (ru_maxrss é em KB no Linux e em bytes no macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 2)
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(files=20, min_pages=1, max_pages=10, llm_latency_ms=0.0, llm_error_rate=0.0, seed=7, workdir=None):
+    """Executa o benchmark e retorna o dicionário de resultados."""
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="bench_propostas_"))
+    corpus = generate_corpus(workdir / "corpus", files, min_pages, max_pages, seed)
+
+    # Isola o benchmark: banco temporário, IA local e sem cache de respostas
+    database.DB_DIR = str(workdir)
+    database.DB_PATH = str(workdir / "bench.db")
+    database.setup_database()
+    llm_cache.CACHE_ENABLED = False
+    llm_backend.set_backend(llm_backend.LocalBackend(latency_ms=llm_latency_ms, error_rate=llm_error_rate, seed=seed))
+    server, url = start_notification_stand_in()
+    notifier.CALLMEBOT_API_URL = url
+    dispatcher = notification_dispatcher.NotificationDispatcher(queue_path=workdir / "notificacoes.db", min_interval=0).start()
+
+    timings = {stage: [] for stage in STAGES}
+    failures = {stage: 0 for stage in STAGES}
+    sizes = []
+    started = time.perf_counter()
+    try:
+        for pdf_path in corpus:
+            sizes.append(pdf_path.stat().st_size)
+            file_start = time.perf_counter()
+
+            t0 = time.perf_counter()
+            text = pdf_extractor.extract_text_from_pdf(pdf_path)
+            timings["extracao"].append(time.perf_counter() - t0)
+            if not text:
+                failures["extracao"] += 1
+                continue
+
+            t0 = time.perf_counter()
+            try:
+                data = analysis_processor.analyze_proposal(text, include_prediction=False)
+            except Exception:
+                data = None
+            timings["analise"].append(time.perf_counter() - t0)
+            if not data:
+                failures["analise"] += 1
+                continue
+            data["nome_arquivo"] = pdf_path.name
+
+            t0 = time.perf_counter()
+            database.insert_proposal(data)
+            timings["banco"].append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            dispatcher.enqueue(data, whatsapp_phone_number="5500000000000", whatsapp_api_key="bench")
+            timings["notificacao"].append(time.perf_counter() - t0)
+
+            timings["total"].append(time.perf_counter() - file_start)
+
+        # As notificações são entregues em segundo plano; mede quanto falta após o pipeline
+        t0 = time.perf_counter()
+        dispatcher.flush(timeout=60)
+        delivery_s = time.perf_counter() - t0
+    finally:
+        dispatcher.stop()
+        server.shutdown()
+        database.close_connections()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "commit": current_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "files": files, "min_pages": min_pages, "max_pages": max_pages,
+            "llm_latency_ms": llm_latency_ms, "llm_error_rate": llm_error_rate, "seed": seed,
+            "corpus_bytes": sum(sizes),
+        },
+        "elapsed_s": round(elapsed, 3),
+        "files_per_second": round(len(timings["total"]) / elapsed, 3) if elapsed else None,
+        "notification_drain_s": round(delivery_s, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "failures": failures,
+        "stages": {stage: summarize(values) for stage, values in timings.items()},
+    }
+
+
+def compare(current, previous):
+    """Imprime a variação das principais métricas em relação a uma execução anterior."""
+    print(f"\nComparação com {previous.get('commit')} ({previous.get('timestamp')}):")
+    for stage in STAGES:
+        for key in ("p50_ms", "p95_ms"):
+            new = current["stages"].get(stage, {}).get(key)
+            old = previous.get("stages", {}).get(stage, {}).get(key)
+            if new is not None and old:
+                print(f"  {stage:<12} {key:<7} {old:>10.2f} -> {new:>10.2f} ({(new - old) / old * 100:+.1f}%)")
+    for key in ("files_per_second", "peak_rss_mb"):
+        new, old = current.get(key), previous.get(key)
+        if new is not None and old:
+            print(f"  {key:<20} {old:>10.2f} -> {new:>10.2f} ({(new - old) / old * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta do pipeline de propostas.")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--min-pages", type=int, default=1)
+    parser.add_argument("--max-pages", type=int, default=10)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Latência simulada de cada chamada à IA.")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fração de chamadas à IA que falham.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workdir", help="Pasta para o corpus e o banco (padrão: temporária).")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: benchmarks/results/).")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar.")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        args.files, args.min_pages, args.max_pages, args.llm_latency_ms, args.llm_error_rate, args.seed, args.workdir
+    )
+
+    output = Path(args.output) if args.output else RESULTS_DIR / (
+        f"benchmark_{results['commit'] or 'sem_commit'}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    print(f"Arquivos: {results['config']['files']} | {results['files_per_second']} arquivos/s | "
+          f"pico de RSS: {results['peak_rss_mb']} MB")
+    for stage, stats in results["stages"].items():
+        print(f"  {stage:<12} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms")
+    print(f"Resultados salvos em '{output}'.")
+
+    if args.compare:
+        compare(results, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
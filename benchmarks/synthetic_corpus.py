@@ -0,0 +1,91 @@
+"""
+Gerador de PDFs sintéticos de propostas comerciais para os benchmarks.
+
+Uso:
+    python -m benchmarks.synthetic_corpus --out corpus --files 50 --min-pages 1 --max-pages 40
+"""
+import argparse
+import random
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+CLIENTS = [
+    "Construtora Horizonte Ltda", "Grupo Alvorada S.A.", "Metalúrgica Boa Vista", "Clínica Vida Plena",
+    "Transportadora Rota Sul", "Escola Novo Saber", "Agropecuária Campo Verde", "Hotel Mar Azul",
+]
+OBJECTS = [
+    ("Desenvolvimento de sistema de gestão de obras", "gestao_obras"),
+    ("Consultoria em processos e diagnóstico financeiro", "consultoria"),
+    ("Manutenção e suporte premium da plataforma", "suporte_premium"),
+    ("Licenciamento anual do software de relatórios", "relatorios"),
+    ("Desenvolvimento de website institucional com blog", "website_institucional"),
+]
+FILLER = (
+    "A CONTRATADA compromete-se a executar os serviços descritos nesta proposta observando as boas práticas "
+    "de mercado, a legislação vigente e os níveis de serviço acordados entre as partes. "
+)
+
+
+def _format_brl(value):
+    return f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def build_proposal_text(rng, index):
+    """Monta o texto da primeira página de uma proposta sintética."""
+    client = rng.choice(CLIENTS)
+    description, _ = rng.choice(OBJECTS)
+    value = rng.randrange(5_000, 500_000, 500)
+    deadline = rng.choice([15, 30, 45, 60, 90, 120])
+    installments = rng.choice([1, 2, 3, 6, 10])
+    return (
+        f"PROPOSTA COMERCIAL Nº {index:05d}\n\n"
+        f"Cliente: {client}\n"
+        f"Objeto: {description}\n"
+        f"Valor total: R$ {_format_brl(value)}\n"
+        f"Prazo de entrega: {deadline} dias\n"
+        f"Pagamento em {installments} parcela(s) mensais\n"
+        f"Validade da proposta: 30 dias\n"
+    )
+
+
+def generate_proposal_pdf(path, rng, index, pages):
+    """Gera um PDF com `pages` páginas: a primeira com os dados da proposta e as demais com anexos."""
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_textbox(fitz.Rect(50, 50, 550, 800), build_proposal_text(rng, index), fontsize=11)
+    for number in range(1, pages):
+        page = doc.new_page()
+        paragraphs = FILLER * rng.randint(8, 20)
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), f"ANEXO {number}\n\n{paragraphs}", fontsize=9)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def generate_corpus(out_dir, files=20, min_pages=1, max_pages=10, seed=7):
+    """Gera `files` PDFs em `out_dir` e retorna a lista de caminhos."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for index in range(files):
+        pages = rng.randint(min_pages, max_pages)
+        paths.append(generate_proposal_pdf(out_dir / f"proposta_sintetica_{index:05d}.pdf", rng, index, pages))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um corpus de propostas sintéticas em PDF.")
+    parser.add_argument("--out", default="corpus_sintetico")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--min-pages", type=int, default=1)
+    parser.add_argument("--max-pages", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    paths = generate_corpus(args.out, args.files, args.min_pages, args.max_pages, args.seed)
+    print(f"{len(paths)} PDF(s) gerados em '{args.out}'.")
+
+
+if __name__ == "__main__":
+    main()
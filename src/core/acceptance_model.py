@@ -0,0 +1,284 @@
+import argparse
+import json
+import os
+import re
+import time
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import logging
+from . import logging_config
+from . import database_service as database
+
+logger = logging.getLogger(__name__)
+
+HISTORICAL_CSV_PATH = os.getenv(
+    "ACCEPTANCE_HISTORICAL_CSV", os.path.join(database.project_root, "data", "propostas_historicas.csv")
+)
+ACCEPTANCE_MODEL_PATH = os.getenv("ACCEPTANCE_MODEL_PATH", os.path.join(database.DB_DIR, "modelo_aceitacao.json"))
+# Abaixo desta confiança a previsão local não é usada (a IA ou "pendente" decidem)
+ACCEPTANCE_MIN_CONFIDENCE = float(os.getenv("ACCEPTANCE_MIN_CONFIDENCE", "0.7"))
+# Se a previsão local não for confiável, pergunta à IA (senão a proposta fica "pendente")
+ACCEPTANCE_LLM_FALLBACK = os.getenv("ACCEPTANCE_LLM_FALLBACK", "1") not in ("0", "false", "False")
+
+# Hiperparâmetros da regressão logística
+LEARNING_RATE = 0.1
+EPOCHS = 2000
+L2_PENALTY = 0.01
+
+# Apenas propostas com desfecho conhecido entram no treino
+OUTCOME_LABELS = ('aceita', 'recusada')
+
+_model_cache = {"path": None, "mtime": None, "model": None}
+
+
+# --- Atributos ---
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+def _split_tags(value):
+    if not isinstance(value, str) or not value.strip():
+        return []
+    return [tag.strip() for tag in re.split(r"[,|;]", value) if tag.strip()]
+
+def _scope_text(df):
+    """Texto livre usado para reconhecer as tags de escopo em propostas do banco."""
+    parts = [df[column].fillna("").astype(str) for column in ("produto_servico", "condicoes", "resumo_ia") if column in df]
+    if not parts:
+        return pd.Series("", index=df.index)
+    return parts[0].str.cat(parts[1:], sep=" ") if len(parts) > 1 else parts[0]
+
+def prepare_frame(df):
+    """
+    Normaliza um DataFrame de propostas (histórico em CSV ou tabela do banco) para as colunas
+    usadas pelo modelo: valor, prazo_dias, escopo_tags (lista), proposal_type e, se houver, status.
+    No banco, o prazo é lido das condições ("30 dias") e as tags são reconhecidas no texto.
+    """
+    frame = pd.DataFrame(index=df.index)
+    frame["valor"] = pd.to_numeric(df["valor"] if "valor" in df else df.get("valor_proposta"), errors="coerce")
+    if "prazo_dias" in df:
+        frame["prazo_dias"] = pd.to_numeric(df["prazo_dias"], errors="coerce")
+    elif "condicoes" in df:
+        frame["prazo_dias"] = pd.to_numeric(
+            df["condicoes"].fillna("").astype(str).str.extract(r"(\d+)\s*dias", flags=re.IGNORECASE)[0], errors="coerce"
+        )
+    else:
+        frame["prazo_dias"] = np.nan
+    frame["escopo_tags"] = df["escopo_tags"].map(_split_tags) if "escopo_tags" in df else None
+    frame["texto_escopo"] = _scope_text(df).map(_normalize)
+    frame["proposal_type"] = df["proposal_type"] if "proposal_type" in df else None
+    if "status" in df:
+        frame["status"] = df["status"]
+    return frame
+
+def _tag_matrix(frame, vocabulary):
+    """One-hot das tags: usa a lista de tags quando existe; senão, procura cada tag no texto."""
+    matrix = np.zeros((len(frame), len(vocabulary)))
+    tags = frame["escopo_tags"]
+    texts = frame["texto_escopo"]
+    for column, tag in enumerate(vocabulary):
+        phrase = tag.replace("_", " ")
+        from_list = tags.map(lambda values: isinstance(values, list) and tag in values)
+        from_text = tags.isna() & texts.str.contains(rf"\b{re.escape(phrase)}\b", regex=True)
+        matrix[:, column] = (from_list | from_text).to_numpy(dtype=float)
+    return matrix
+
+def build_features(frame, model):
+    """Monta a matriz de atributos (NumPy) de um DataFrame já preparado, com a normalização do modelo."""
+    valor = np.log1p(frame["valor"].fillna(model["medianas"]["valor"]).clip(lower=0).to_numpy(dtype=float))
+    prazo = frame["prazo_dias"].fillna(model["medianas"]["prazo_dias"]).to_numpy(dtype=float)
+    numeric = (np.column_stack([valor, prazo]) - model["medias"]) / model["desvios"]
+    types = np.column_stack(
+        [(frame["proposal_type"] == proposal_type).to_numpy(dtype=float) for proposal_type in model["tipos"]]
+    ) if model["tipos"] else np.zeros((len(frame), 0))
+    return np.hstack([numeric, _tag_matrix(frame, model["tags"]), types])
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+# --- Treino e avaliação ---
+
+def load_training_data(include_db=True):
+    """Junta o histórico em CSV com as propostas do banco que já têm desfecho (aceita/recusada)."""
+    frames = []
+    if os.path.exists(HISTORICAL_CSV_PATH):
+        frames.append(prepare_frame(pd.read_csv(HISTORICAL_CSV_PATH)))
+    if include_db:
+        db_df = database.query_proposals(
+            status=list(OUTCOME_LABELS),
+            columns=['valor_proposta', 'condicoes', 'produto_servico', 'resumo_ia', 'proposal_type', 'status'],
+        )
+        if not db_df.empty:
+            frames.append(prepare_frame(db_df))
+    if not frames:
+        return pd.DataFrame()
+    data = pd.concat(frames, ignore_index=True)
+    return data[data["status"].isin(OUTCOME_LABELS)].reset_index(drop=True)
+
+def _std(values):
+    std = float(values.std()) if len(values) > 1 else 0.0
+    return std if std > 0 else 1.0
+
+def fit(frame):
+    """Treina a regressão logística (gradiente descendente vetorizado) e retorna o modelo como dicionário."""
+    tags = sorted({tag for values in frame["escopo_tags"].dropna() for tag in values})
+    types = sorted(frame["proposal_type"].dropna().unique().tolist())
+    valor = np.log1p(frame["valor"].dropna().clip(lower=0))
+    model = {
+        "tags": tags,
+        "tipos": types,
+        "medianas": {
+            "valor": float(frame["valor"].median()) if frame["valor"].notna().any() else 0.0,
+            "prazo_dias": float(frame["prazo_dias"].median()) if frame["prazo_dias"].notna().any() else 0.0,
+        },
+    }
+    prazo = frame["prazo_dias"].fillna(model["medianas"]["prazo_dias"])
+    model["medias"] = [float(valor.mean()) if len(valor) else 0.0, float(prazo.mean())]
+    model["desvios"] = [_std(valor), _std(prazo)]
+
+    X = build_features(frame, model)
+    y = (frame["status"] == "aceita").to_numpy(dtype=float)
+    weights = np.zeros(X.shape[1])
+    bias = 0.0
+    for _ in range(EPOCHS):
+        error = _sigmoid(X @ weights + bias) - y
+        weights -= LEARNING_RATE * (X.T @ error / len(y) + L2_PENALTY * weights)
+        bias -= LEARNING_RATE * error.mean()
+    model["pesos"] = weights.tolist()
+    model["vies"] = float(bias)
+    model["amostras"] = int(len(y))
+    return model
+
+def _score(frame, model):
+    X = build_features(frame, model)
+    return _sigmoid(X @ np.asarray(model["pesos"]) + model["vies"])
+
+def evaluate(frame, folds=5, seed=42):
+    """
+    Validação cruzada em k partes: acurácia, log loss e matriz de confusão (aceita/recusada).
+    Com poucas amostras, k vira o número de amostras (deixa-um-de-fora).
+    """
+    folds = max(2, min(folds, len(frame)))
+    order = np.random.default_rng(seed).permutation(len(frame))
+    probabilities = np.zeros(len(frame))
+    for part in np.array_split(order, folds):
+        train_idx = np.setdiff1d(order, part)
+        model = fit(frame.iloc[train_idx])
+        probabilities[part] = _score(frame.iloc[part], model)
+    y = (frame["status"] == "aceita").to_numpy()
+    predicted = probabilities >= 0.5
+    eps = 1e-9
+    log_loss = -np.mean(y * np.log(probabilities + eps) + (~y) * np.log(1 - probabilities + eps))
+    return {
+        "amostras": int(len(frame)),
+        "partes": int(folds),
+        "acuracia": float((predicted == y).mean()),
+        "log_loss": float(log_loss),
+        "confusao": {
+            "aceita_prevista_aceita": int((predicted & y).sum()),
+            "recusada_prevista_aceita": int((predicted & ~y).sum()),
+            "aceita_prevista_recusada": int((~predicted & y).sum()),
+            "recusada_prevista_recusada": int((~predicted & ~y).sum()),
+        },
+    }
+
+
+# --- Persistência ---
+
+def save_model(model, path=None):
+    path = Path(path or ACCEPTANCE_MODEL_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(model, indent=2, ensure_ascii=False), encoding="utf-8")
+    logger.info(f"Modelo de aceitação salvo em '{path}'.")
+    return path
+
+def load_model(path=None):
+    """Carrega o modelo salvo (mantendo-o em memória até o arquivo mudar). Retorna None se não existir."""
+    path = str(path or ACCEPTANCE_MODEL_PATH)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _model_cache["path"] != path or _model_cache["mtime"] != mtime:
+        try:
+            with open(path, encoding="utf-8") as f:
+                _model_cache.update(path=path, mtime=mtime, model=json.load(f))
+        except (OSError, ValueError) as e:
+            logger.error(f"Erro ao carregar o modelo de aceitação de '{path}': {e}", exc_info=True)
+            return None
+    return _model_cache["model"]
+
+
+# --- Previsão ---
+
+def predict_many(df, model=None):
+    """
+    Calcula a previsão de aceitação de várias propostas de uma só vez (operações vetorizadas).
+    Retorna um DataFrame com o mesmo índice e as colunas prob_aceitacao, previsao e confianca.
+    Retorna None se não houver modelo treinado.
+    """
+    model = model or load_model()
+    if model is None:
+        return None
+    probabilities = _score(prepare_frame(df), model)
+    return pd.DataFrame({
+        "prob_aceitacao": probabilities,
+        "previsao": np.where(probabilities >= 0.5, "aceita", "recusada"),
+        "confianca": np.maximum(probabilities, 1 - probabilities),
+    }, index=df.index)
+
+def predict_one(structured_data, model=None):
+    """Previsão para uma proposta (dicionário): retorna (previsao, confianca) ou None sem modelo."""
+    result = predict_many(pd.DataFrame([structured_data]), model)
+    if result is None:
+        return None
+    return result["previsao"].iloc[0], float(result["confianca"].iloc[0])
+
+
+# --- Linha de comando ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Modelo local de previsão de aceitação das propostas.")
+    parser.add_argument("comando", choices=["treinar", "avaliar", "prever"])
+    parser.add_argument("--sem-banco", action="store_true", help="Treina/avalia apenas com o histórico em CSV.")
+    parser.add_argument("--partes", type=int, default=5, help="Partes da validação cruzada (avaliar).")
+    parser.add_argument("--modelo", help=f"Arquivo do modelo (padrão: {ACCEPTANCE_MODEL_PATH}).")
+    args = parser.parse_args()
+    database.setup_database()
+
+    if args.comando == "prever":
+        df = database.query_proposals(
+            columns=['id', 'nome_cliente', 'valor_proposta', 'condicoes', 'produto_servico', 'resumo_ia', 'proposal_type', 'status']
+        )
+        start = time.perf_counter()
+        predictions = predict_many(df, load_model(args.modelo))
+        if predictions is None:
+            print("Nenhum modelo treinado. Rode o comando 'treinar' primeiro.")
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        result = df[['id', 'nome_cliente', 'status']].join(predictions)
+        print(result.to_string(index=False))
+        print(f"\n{len(result)} propostas pontuadas em {elapsed_ms:.1f} ms.")
+        return
+
+    data = load_training_data(include_db=not args.sem_banco)
+    if data.empty or data["status"].nunique() < 2:
+        print("Dados insuficientes: são necessárias propostas aceitas e recusadas.")
+        return
+    metrics = evaluate(data, folds=args.partes)
+    print(json.dumps(metrics, indent=2, ensure_ascii=False))
+    if args.comando == "treinar":
+        model = fit(data)
+        model["treinado_em"] = datetime.now().isoformat(timespec="seconds")
+        model["avaliacao"] = metrics
+        print(f"Modelo salvo em '{save_model(model, args.modelo)}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import threading
 import google.generativeai as genai
 from dotenv import load_dotenv
 import logging
@@ -6,10 +7,81 @@ import logging
 logger = logging.getLogger(__name__)
 load_dotenv()
 
+DEFAULT_MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+
+# Configuração padrão de cada tarefa. O modelo de uma tarefa pode ser trocado
+# pela variável de ambiente GEMINI_MODEL_<TAREFA> (ex.: GEMINI_MODEL_RESUMO).
+DEFAULT_TASK_CONFIGS = {
+    "extracao": {},
+    "resumo": {},
+    "previsao": {},
+    "analise_combinada": {"generation_config": {"response_mime_type": "application/json"}},
+    "resumo_pendentes": {},
+    "resumo_pendentes_parcial": {},
+}
+
+_lock = threading.Lock()
+_configured = False
+_task_configs = {}
+_models = {}
+
 def configure_ai():
-    """Configura a API do Google AI com a chave do .env."""
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        logger.error("A chave da API do Google não foi encontrada. Verifique seu arquivo .env.")
-        raise ValueError("A chave da API do Google não foi encontrada. Verifique seu arquivo .env.")
-    genai.configure(api_key=api_key)
+    """Configura a API do Google AI com a chave do .env (apenas uma vez por processo)."""
+    global _configured
+    if _configured:
+        return
+    with _lock:
+        if _configured:
+            return
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            logger.error("A chave da API do Google não foi encontrada. Verifique seu arquivo .env.")
+            raise ValueError("A chave da API do Google não foi encontrada. Verifique seu arquivo .env.")
+        genai.configure(api_key=api_key)
+        _configured = True
+        logger.info("API do Google AI configurada.")
+
+def set_task_config(task, model_name=None, generation_config=None):
+    """Define o modelo e/ou a configuração de geração usados por uma tarefa."""
+    with _lock:
+        config = dict(_task_configs.get(task, {}))
+        if model_name is not None:
+            config["model_name"] = model_name
+        if generation_config is not None:
+            config["generation_config"] = dict(generation_config)
+        _task_configs[task] = config
+
+def get_task_config(task):
+    """Retorna o nome do modelo e a configuração de geração efetivos de uma tarefa."""
+    defaults = DEFAULT_TASK_CONFIGS.get(task, {})
+    overrides = _task_configs.get(task, {})
+    model_name = (
+        overrides.get("model_name")
+        or os.getenv(f"GEMINI_MODEL_{task.upper()}")
+        or defaults.get("model_name")
+        or DEFAULT_MODEL_NAME
+    )
+    generation_config = overrides.get("generation_config", defaults.get("generation_config"))
+    return model_name, generation_config
+
+def get_model_name(task):
+    """Retorna o nome do modelo usado por uma tarefa."""
+    return get_task_config(task)[0]
+
+def get_model(task):
+    """
+    Retorna o modelo configurado para a tarefa, criando-o apenas na primeira vez.
+    Tarefas com o mesmo modelo e a mesma configuração compartilham a instância.
+    """
+    configure_ai()
+    model_name, generation_config = get_task_config(task)
+    key = (model_name, repr(sorted((generation_config or {}).items())))
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                model = genai.GenerativeModel(model_name, generation_config=generation_config)
+                _models[key] = model
+                logger.info(f"Modelo '{model_name}' criado para a tarefa '{task}'.")
+    return model
@@ -1,4 +1,10 @@
 import sqlite3
+import hashlib
+import re
+import threading
+import zlib
+from datetime import date, datetime, timedelta
+from contextlib import contextmanager
 import pandas as pd
 import logging
 import os
@@ -17,75 +23,444 @@ if project_root not in sys.path:
 DB_DIR = os.path.join(project_root, "src", "app", "data")
 DB_PATH = os.path.join(DB_DIR, "propostas.db")
 
+# Ajustes das conexões (o modo WAL permite leituras do painel enquanto o monitoramento grava)
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Nível de compressão (zlib, 1 a 9) do texto extraído guardado em propostas_texto
+TEXT_COMPRESSION_LEVEL = int(os.getenv("TEXT_COMPRESSION_LEVEL", "6"))
+
+# Conexões reutilizadas por thread, uma por arquivo de banco
+_local = threading.local()
+
+# Erros das consultas: o pandas embrulha os erros do SQLite em DatabaseError
+_QUERY_ERRORS = (sqlite3.Error, pd.errors.DatabaseError, ValueError)
+
+@contextmanager
+def raise_query_errors():
+    """
+    Dentro deste bloco, as consultas do painel relançam seus erros em vez de retornar
+    um resultado vazio (usado pelo cache do painel para não guardar resultados de falhas).
+    """
+    previous = getattr(_local, "raise_errors", False)
+    _local.raise_errors = True
+    try:
+        yield
+    finally:
+        _local.raise_errors = previous
+
+def _query_failed(message):
+    """Registra o erro da consulta em andamento; dentro de raise_query_errors(), relança-o."""
+    logger.error(message, exc_info=True)
+    if getattr(_local, "raise_errors", False):
+        raise
+
+def _open_connection(db_path):
+    conn = sqlite3.connect(db_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size={-SQLITE_CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    logger.debug(f"Nova conexão SQLite aberta em modo WAL para {db_path}.")
+    return conn
+
+def get_connection():
+    """
+    Retorna a conexão da thread atual com o banco em DB_PATH, abrindo-a (em modo WAL)
+    na primeira chamada. As conexões não são compartilhadas entre threads.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(DB_PATH)
+    if conn is None:
+        Path(DB_PATH).parent.mkdir(parents=True, exist_ok=True)
+        conn = connections[DB_PATH] = _open_connection(DB_PATH)
+    return conn
+
+def close_connections():
+    """Fecha as conexões abertas pela thread atual."""
+    connections = getattr(_local, "connections", None) or {}
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
+
+@contextmanager
+def transaction():
+    """Executa o bloco em uma única transação: confirma ao final ou desfaz se houver erro."""
+    conn = get_connection()
+    with conn:
+        yield conn.cursor()
+
+def _column_names(cursor, table):
+    return {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+
+def _migration_1_base_table(cursor):
+    """Tabela de propostas, incluindo as colunas adicionadas em bancos antigos."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS propostas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome_cliente TEXT NOT NULL,
+            valor_proposta REAL,
+            produto_servico TEXT,
+            condicoes TEXT,
+            resumo_ia TEXT,
+            nome_arquivo TEXT,
+            data_processamento TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'pendente',
+            proposal_type TEXT
+        )
+    """)
+    columns = _column_names(cursor, "propostas")
+    if "status" not in columns:
+        cursor.execute("ALTER TABLE propostas ADD COLUMN status TEXT DEFAULT 'pendente'")
+    if "proposal_type" not in columns:
+        cursor.execute("ALTER TABLE propostas ADD COLUMN proposal_type TEXT")
+
+def _migration_2_content_hash(cursor):
+    """Hash do PDF, usado para evitar duplicatas."""
+    if "content_hash" not in _column_names(cursor, "propostas"):
+        cursor.execute("ALTER TABLE propostas ADD COLUMN content_hash TEXT")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_propostas_content_hash ON propostas (content_hash)")
+
+def _migration_3_query_indexes(cursor):
+    """Índices para os filtros, agrupamentos e ordenações dos painéis."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_propostas_status_data ON propostas (status, data_processamento)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_propostas_nome_cliente ON propostas (nome_cliente)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_propostas_data ON propostas (data_processamento)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_propostas_proposal_type ON propostas (proposal_type)")
+    cursor.execute("ANALYZE propostas")
+
+def _migration_4_summary_table(cursor):
+    """Tabela de resumo (quantidade e valor por status, cliente e tipo) mantida por triggers."""
+    # Valores nulos são gravados como '' para que a chave primária identifique cada combinação
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS propostas_resumo (
+            status TEXT NOT NULL,
+            nome_cliente TEXT NOT NULL,
+            proposal_type TEXT NOT NULL,
+            quantidade INTEGER NOT NULL DEFAULT 0,
+            valor_total REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (status, nome_cliente, proposal_type)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_resumo_nome_cliente ON propostas_resumo (nome_cliente)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_resumo_proposal_type ON propostas_resumo (proposal_type)")
+    add_new = """
+        INSERT INTO propostas_resumo (status, nome_cliente, proposal_type, quantidade, valor_total)
+        VALUES (COALESCE(NEW.status, ''), COALESCE(NEW.nome_cliente, ''), COALESCE(NEW.proposal_type, ''), 1, COALESCE(NEW.valor_proposta, 0))
+        ON CONFLICT (status, nome_cliente, proposal_type) DO UPDATE SET
+            quantidade = quantidade + 1,
+            valor_total = valor_total + excluded.valor_total;
+    """
+    remove_old = """
+        UPDATE propostas_resumo
+        SET quantidade = quantidade - 1, valor_total = valor_total - COALESCE(OLD.valor_proposta, 0)
+        WHERE status = COALESCE(OLD.status, '') AND nome_cliente = COALESCE(OLD.nome_cliente, '')
+          AND proposal_type = COALESCE(OLD.proposal_type, '');
+        DELETE FROM propostas_resumo WHERE quantidade <= 0;
+    """
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_resumo_insert AFTER INSERT ON propostas BEGIN {add_new} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_resumo_delete AFTER DELETE ON propostas BEGIN {remove_old} END")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_resumo_update
+        AFTER UPDATE OF status, nome_cliente, proposal_type, valor_proposta ON propostas
+        BEGIN {remove_old} {add_new} END
+    """)
+    # Carga inicial com as propostas já existentes
+    cursor.execute("DELETE FROM propostas_resumo")
+    cursor.execute("""
+        INSERT INTO propostas_resumo (status, nome_cliente, proposal_type, quantidade, valor_total)
+        SELECT COALESCE(status, ''), COALESCE(nome_cliente, ''), COALESCE(proposal_type, ''), COUNT(*), COALESCE(SUM(valor_proposta), 0)
+        FROM propostas
+        GROUP BY 1, 2, 3
+    """)
+
+def _migration_5_data_version(cursor):
+    """Contador de versão dos dados, incrementado por triggers a cada alteração nas propostas."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS propostas_versao (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            versao INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO propostas_versao (id, versao) VALUES (1, 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_versao_{event.lower()} AFTER {event} ON propostas
+            BEGIN UPDATE propostas_versao SET versao = versao + 1 WHERE id = 1; END
+        """)
+
+# Formato (com milissegundos) de updated_at, comparável como texto
+_UPDATED_AT_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+def _migration_6_updated_at(cursor):
+    """Coluna updated_at, atualizada por triggers a cada inserção ou alteração."""
+    if "updated_at" not in _column_names(cursor, "propostas"):
+        cursor.execute("ALTER TABLE propostas ADD COLUMN updated_at TEXT")
+    cursor.execute("UPDATE propostas SET updated_at = COALESCE(data_processamento, " + _UPDATED_AT_NOW + ") WHERE updated_at IS NULL")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_propostas_updated_at ON propostas (updated_at)")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_updated_at_insert AFTER INSERT ON propostas
+        BEGIN UPDATE propostas SET updated_at = {_UPDATED_AT_NOW} WHERE id = NEW.id; END
+    """)
+    # Só dispara quando quem alterou não definiu updated_at (evita laço com a própria atualização)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_updated_at_update AFTER UPDATE ON propostas
+        WHEN NEW.updated_at IS OLD.updated_at
+        BEGIN UPDATE propostas SET updated_at = {_UPDATED_AT_NOW} WHERE id = NEW.id; END
+    """)
+
+# Colunas do índice de busca textual (texto_extraido é gravado à parte, ver insert_proposal)
+FTS_COLUMNS = ('nome_cliente', 'produto_servico', 'condicoes', 'resumo_ia')
+# Pesos de cada coluna do índice (incluindo texto_extraido) na ordenação por relevância (bm25)
+FTS_WEIGHTS = (2.0, 2.0, 1.0, 1.5, 0.5)
+# Acima desta quantidade de resultados, a busca não calcula a relevância (bm25 de todos os
+# resultados seria lento) e traz os mais recentes: termos tão comuns não distinguem as propostas
+SEARCH_RANK_MAX_MATCHES = int(os.getenv("SEARCH_RANK_MAX_MATCHES", "20000"))
+
+def _migration_7_full_text_search(cursor):
+    """Índice FTS5 sobre cliente, produto, condições, resumo e texto extraído, mantido por triggers."""
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS propostas_fts USING fts5(
+            nome_cliente, produto_servico, condicoes, resumo_ia, texto_extraido,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+    columns = ", ".join(FTS_COLUMNS)
+    new_values = ", ".join(f"NEW.{column}" for column in FTS_COLUMNS)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_fts_insert AFTER INSERT ON propostas
+        BEGIN INSERT INTO propostas_fts (rowid, {columns}) VALUES (NEW.id, {new_values}); END
+    """)
+    # Atualiza só os campos da proposta, preservando o texto extraído já indexado
+    assignments = ", ".join(f"{column} = NEW.{column}" for column in FTS_COLUMNS)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_fts_update AFTER UPDATE OF {columns} ON propostas
+        BEGIN UPDATE propostas_fts SET {assignments} WHERE rowid = NEW.id; END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_fts_delete AFTER DELETE ON propostas
+        BEGIN DELETE FROM propostas_fts WHERE rowid = OLD.id; END
+    """)
+    # Relevância padrão (coluna rank): bm25 com os pesos de cada coluna
+    weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+    cursor.execute("INSERT INTO propostas_fts (propostas_fts, rank) VALUES ('rank', ?)", (f"bm25({weights})",))
+    cursor.execute("DELETE FROM propostas_fts")
+    cursor.execute(f"INSERT INTO propostas_fts (rowid, {columns}) SELECT id, {columns} FROM propostas")
+
+def _migration_8_reanalysis_checkpoints(cursor):
+    """Execuções de reanálise em lote e o andamento de cada proposta, para retomar execuções interrompidas."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reanalise_execucoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            descricao TEXT,
+            total INTEGER NOT NULL,
+            criada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reanalise_itens (
+            execucao_id INTEGER NOT NULL REFERENCES reanalise_execucoes (id),
+            proposta_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            erro TEXT,
+            atualizada_em TIMESTAMP,
+            PRIMARY KEY (execucao_id, proposta_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reanalise_itens_status ON reanalise_itens (execucao_id, status)")
+
+def _compress_text(text):
+    return zlib.compress(text.encode("utf-8"), TEXT_COMPRESSION_LEVEL)
+
+def _decompress_text(blob):
+    return zlib.decompress(blob).decode("utf-8")
+
+def _migration_9_extracted_text(cursor):
+    """Texto extraído dos PDFs, comprimido, em tabela separada das propostas (por ID e hash do conteúdo)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS propostas_texto (
+            proposta_id INTEGER PRIMARY KEY REFERENCES propostas (id),
+            content_hash TEXT,
+            texto BLOB NOT NULL,
+            tamanho INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_propostas_texto_hash ON propostas_texto (content_hash)")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_texto_delete AFTER DELETE ON propostas
+        BEGIN DELETE FROM propostas_texto WHERE proposta_id = OLD.id; END
+    """)
+    # Traz para a nova tabela o texto que até aqui só estava no índice de busca
+    rows = cursor.execute("""
+        SELECT p.id, p.content_hash, f.texto_extraido FROM propostas p
+        JOIN propostas_fts f ON f.rowid = p.id WHERE f.texto_extraido IS NOT NULL AND f.texto_extraido != ''
+    """).fetchall()
+    cursor.executemany(
+        "INSERT OR REPLACE INTO propostas_texto (proposta_id, content_hash, texto, tamanho) VALUES (?, ?, ?, ?)",
+        [(proposal_id, content_hash, _compress_text(text), len(text)) for proposal_id, content_hash, text in rows],
+    )
+
+# Migrações do esquema, aplicadas em ordem. O número de cada uma é gravado em PRAGMA user_version.
+# Para alterar o esquema, acrescente uma nova função ao final (nunca altere as já publicadas).
+MIGRATIONS = [
+    (1, _migration_1_base_table),
+    (2, _migration_2_content_hash),
+    (3, _migration_3_query_indexes),
+    (4, _migration_4_summary_table),
+    (5, _migration_5_data_version),
+    (6, _migration_6_updated_at),
+    (7, _migration_7_full_text_search),
+    (8, _migration_8_reanalysis_checkpoints),
+    (9, _migration_9_extracted_text),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version():
+    """Versão do esquema gravada no banco (0 para bancos criados antes das migrações)."""
+    return get_connection().execute("PRAGMA user_version").fetchone()[0]
+
+def get_data_version():
+    """
+    Versão atual dos dados das propostas: muda a cada inserção, alteração ou exclusão,
+    inclusive as feitas por outros processos. Retorna None se não puder ser lida.
+    """
+    try:
+        row = get_connection().execute("SELECT versao FROM propostas_versao WHERE id = 1").fetchone()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        logger.error(f"Erro ao ler a versão dos dados: {e}", exc_info=True)
+        return None
+
 def setup_database():
-    """Configura o banco de dados SQLite, criando a tabela se não existir."""
+    """
+    Configura o banco de dados SQLite, aplicando as migrações pendentes.
+    Quando o esquema já está na versão atual, não faz nada além de ler PRAGMA user_version.
+    """
     Path(DB_DIR).mkdir(parents=True, exist_ok=True) # Garante que a pasta 'data' existe
-    conn = None
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS propostas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome_cliente TEXT NOT NULL,
-                valor_proposta REAL,
-                produto_servico TEXT,
-                condicoes TEXT,
-                resumo_ia TEXT,
-                nome_arquivo TEXT,
-                data_processamento TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'pendente',
-                proposal_type TEXT
-            )
-        """)
-        
-        # Adicionar a coluna 'status' se não existir (para compatibilidade com versões anteriores)
-        try:
-            cursor.execute("ALTER TABLE propostas ADD COLUMN status TEXT DEFAULT 'pendente'")
-            logger.info("Coluna 'status' adicionada à tabela 'propostas'.")
-        except sqlite3.OperationalError:
-            pass # Coluna já existe
-
-        # Adicionar a coluna 'proposal_type' se não existir
-        try:
-            cursor.execute("ALTER TABLE propostas ADD COLUMN proposal_type TEXT")
-            logger.info("Coluna 'proposal_type' adicionada à tabela 'propostas'.")
-        except sqlite3.OperationalError:
-            pass # Coluna já existe
-
-        conn.commit()
-        logger.info("Banco de dados configurado e tabela 'propostas' verificada/criada/atualizada.")
+    try:
+        if get_schema_version() >= SCHEMA_VERSION:
+            return
+        conn = get_connection()
+        with conn:
+            # Trava de escrita antes de reler a versão: outro processo pode ter migrado nesse meio-tempo
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.cursor()
+            current = cursor.execute("PRAGMA user_version").fetchone()[0]
+            for version, migration in MIGRATIONS:
+                if version <= current:
+                    continue
+                migration(cursor)
+                cursor.execute(f"PRAGMA user_version = {version}")
+                logger.info(f"Migração {version} aplicada: {migration.__doc__}")
+        logger.info(f"Banco de dados configurado (esquema na versão {SCHEMA_VERSION}).")
     except sqlite3.Error as e:
         logger.error(f"Erro ao configurar o banco de dados: {e}", exc_info=True)
-    finally:
-        if conn:
-            conn.close()
-
-def insert_proposal(data):
-    """Insere uma nova proposta no banco de dados."""
-    conn = None
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO propostas (nome_cliente, valor_proposta, produto_servico, proposal_type, condicoes, resumo_ia, nome_arquivo)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            data.get('nome_cliente'),
-            data.get('valor_proposta'),
-            data.get('produto_servico'),
-            data.get('proposal_type'),
-            data.get('condicoes'),
-            data.get('resumo_ia'),
-            data.get('nome_arquivo')
-        ))
-        conn.commit()
+
+def compute_content_hash(source):
+    """
+    Calcula o hash SHA-256 do conteúdo de um PDF.
+    Aceita o caminho do arquivo ou o conteúdo em bytes (ex.: upload do Streamlit).
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    else:
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+def get_proposal_by_hash(content_hash):
+    """Busca a proposta já registrada com o mesmo hash de conteúdo, se existir."""
+    if not content_hash:
+        return None
+    try:
+        cursor = get_connection().cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute("SELECT * FROM propostas WHERE content_hash = ?", (content_hash,))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    except sqlite3.Error as e:
+        logger.error(f"Erro ao buscar proposta pelo hash de conteúdo: {e}", exc_info=True)
+        return None
+
+_INSERT_PROPOSAL_SQL = """
+    INSERT INTO propostas (nome_cliente, valor_proposta, produto_servico, proposal_type, condicoes, resumo_ia, nome_arquivo, content_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _proposal_values(data):
+    return (
+        data.get('nome_cliente'),
+        data.get('valor_proposta'),
+        data.get('produto_servico'),
+        data.get('proposal_type'),
+        data.get('condicoes'),
+        data.get('resumo_ia'),
+        data.get('nome_arquivo'),
+        data.get('content_hash')
+    )
+
+def _save_text(cursor, proposal_id, extracted_text, content_hash=None):
+    """Grava o texto extraído (comprimido) e o inclui no índice de busca."""
+    cursor.execute(
+        "INSERT OR REPLACE INTO propostas_texto (proposta_id, content_hash, texto, tamanho) VALUES (?, ?, ?, ?)",
+        (proposal_id, content_hash, _compress_text(extracted_text), len(extracted_text)),
+    )
+    cursor.execute("UPDATE propostas_fts SET texto_extraido = ? WHERE rowid = ?", (extracted_text, proposal_id))
+
+def _insert_one(cursor, data, extracted_text=None):
+    """Insere uma proposta com o cursor informado; em caso de hash repetido, retorna o ID existente."""
+    try:
+        cursor.execute(_INSERT_PROPOSAL_SQL, _proposal_values(data))
+        proposal_id = cursor.lastrowid
+        if extracted_text:
+            _save_text(cursor, proposal_id, extracted_text, data.get('content_hash'))
+        return proposal_id
+    except sqlite3.IntegrityError:
+        content_hash = data.get('content_hash')
+        row = cursor.execute("SELECT id FROM propostas WHERE content_hash = ?", (content_hash,)).fetchone() if content_hash else None
+        if row:
+            logger.warning(f"Proposta com o mesmo conteúdo já registrada (ID {row[0]}). Inserção ignorada.")
+            return row[0]
+        raise
+
+def insert_proposal(data, extracted_text=None):
+    """
+    Insere uma nova proposta no banco de dados e retorna o ID.
+    O texto extraído do PDF, se informado, é guardado comprimido e incluído no índice de busca.
+    Se já existir uma proposta com o mesmo hash de conteúdo, retorna o ID existente.
+    """
+    try:
+        with transaction() as cursor:
+            proposal_id = _insert_one(cursor, data, extracted_text)
         logger.info(f"Proposta para '{data.get('nome_cliente')}' inserida com sucesso.")
+        return proposal_id
     except sqlite3.Error as e:
         logger.error(f"Erro ao inserir proposta: {e}", exc_info=True)
-    finally:
-        if conn:
-            conn.close()
+        return None
+
+def insert_proposals(proposals, extracted_texts=None):
+    """
+    Insere várias propostas em uma única transação e retorna a lista de IDs, na mesma ordem.
+    `extracted_texts`, se informado, traz o texto extraído de cada proposta (na mesma ordem).
+    Propostas com hash de conteúdo já registrado recebem o ID existente.
+    Se alguma inserção falhar, nenhuma é gravada e a função retorna None.
+    """
+    proposals = list(proposals)
+    if not proposals:
+        return []
+    texts = list(extracted_texts) if extracted_texts is not None else [None] * len(proposals)
+    try:
+        with transaction() as cursor:
+            ids = [_insert_one(cursor, data, text) for data, text in zip(proposals, texts)]
+        logger.info(f"{len(ids)} propostas inseridas em lote.")
+        return ids
+    except sqlite3.Error as e:
+        logger.error(f"Erro ao inserir propostas em lote: {e}", exc_info=True)
+        return None
 
 
 
@@ -93,88 +468,393 @@ def get_all_proposals_as_dataframe():
     """
     Busca todas as propostas no banco de dados e retorna como um DataFrame do pandas.
     """
-    conn = None
     try:
-        conn = sqlite3.connect(DB_PATH)
-        df = pd.read_sql_query("SELECT * FROM propostas", conn)
+        df = pd.read_sql_query("SELECT * FROM propostas", get_connection())
         logger.info(f"Buscados {len(df)} registros de propostas.")
         return df
-    except sqlite3.Error as e:
+    except _QUERY_ERRORS as e:
         logger.error(f"Erro ao buscar todas as propostas como DataFrame: {e}", exc_info=True)
         return pd.DataFrame()
-    finally:
-        if conn:
-            conn.close()
+
+# Colunas que podem ser pedidas, filtradas ou usadas na ordenação das consultas
+PROPOSAL_COLUMNS = (
+    'id', 'nome_cliente', 'valor_proposta', 'produto_servico', 'proposal_type', 'condicoes',
+    'resumo_ia', 'nome_arquivo', 'data_processamento', 'status', 'content_hash', 'updated_at',
+)
+# Colunas curtas usadas nas listagens (sem os textos longos de resumo e condições)
+LIST_COLUMNS = ['id', 'nome_cliente', 'valor_proposta', 'produto_servico', 'proposal_type', 'status', 'data_processamento']
+
+def _check_column(column):
+    if column not in PROPOSAL_COLUMNS:
+        raise ValueError(f"Coluna desconhecida: {column}")
+    return column
+
+def _date_bound(value, end=False):
+    """Converte a data do filtro para o formato gravado em data_processamento. Datas finais são inclusivas."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value) if len(value) > 10 else date.fromisoformat(value)
+    if not isinstance(value, datetime):
+        value = datetime.combine(value + timedelta(days=1) if end else value, datetime.min.time())
+        return value.strftime('%Y-%m-%d %H:%M:%S'), '<' if end else '>='
+    return value.strftime('%Y-%m-%d %H:%M:%S'), '<=' if end else '>='
+
+def _build_filters(status=None, clients=None, proposal_types=None, date_from=None, date_to=None):
+    """
+    Monta a cláusula WHERE e os parâmetros dos filtros. Um filtro None é ignorado;
+    uma lista vazia não corresponde a nenhuma proposta.
+    """
+    clauses, params = [], []
+    for column, values in (('status', status), ('nome_cliente', clients), ('proposal_type', proposal_types)):
+        if values is None:
+            continue
+        values = [values] if isinstance(values, str) else list(values)
+        if not values:
+            clauses.append("0")
+            continue
+        clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+    for value, end in ((date_from, False), (date_to, True)):
+        if value:
+            bound, operator = _date_bound(value, end)
+            clauses.append(f"data_processamento {operator} ?")
+            params.append(bound)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+def query_proposals(status=None, clients=None, proposal_types=None, date_from=None, date_to=None,
+                    columns=None, order_by='data_processamento', descending=True, limit=None, offset=0):
+    """
+    Busca propostas aplicando filtros, projeção de colunas, ordenação e paginação no próprio SQL.
+    Por padrão retorna as colunas de listagem (LIST_COLUMNS), das mais recentes para as mais antigas.
+    """
+    try:
+        columns = [_check_column(column) for column in (columns or LIST_COLUMNS)]
+        direction = 'DESC' if descending else 'ASC'
+        where, params = _build_filters(status, clients, proposal_types, date_from, date_to)
+        # O id desempata a ordenação para que as páginas sejam estáveis
+        query = f"SELECT {', '.join(columns)} FROM propostas{where} ORDER BY {_check_column(order_by)} {direction}, id {direction}"
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params += [int(limit), int(offset)]
+        return pd.read_sql_query(query, get_connection(), params=params)
+    except _QUERY_ERRORS as e:
+        _query_failed(f"Erro ao consultar propostas: {e}")
+        return pd.DataFrame(columns=columns or LIST_COLUMNS)
+
+def get_change_watermark():
+    """
+    Marca d'água das alterações: o maior updated_at registrado.
+    Deve ser lida antes da consulta cujos resultados serão atualizados depois com
+    get_proposals_changed_since, para que nenhuma alteração fique de fora.
+    """
+    try:
+        return get_connection().execute("SELECT MAX(updated_at) FROM propostas").fetchone()[0] or ""
+    except sqlite3.Error as e:
+        logger.error(f"Erro ao ler a marca d'água das alterações: {e}", exc_info=True)
+        return None
+
+def get_proposals_changed_since(watermark, columns=None):
+    """
+    Busca as propostas inseridas ou alteradas a partir da marca d'água informada.
+    Retorna (DataFrame com as alterações, nova marca d'água). Linhas com updated_at igual
+    à marca d'água são devolvidas de novo, pois podem ter sido gravadas no mesmo milissegundo;
+    quem aplica as alterações deve fazer upsert pelo id. Em caso de erro, retorna (None, watermark).
+    """
+    try:
+        columns = [_check_column(column) for column in (columns or LIST_COLUMNS)]
+        if 'updated_at' not in columns:
+            columns.append('updated_at')
+        changes = pd.read_sql_query(
+            f"SELECT {', '.join(columns)} FROM propostas WHERE updated_at >= ? ORDER BY updated_at",
+            get_connection(), params=[watermark or ""],
+        )
+        new_watermark = changes['updated_at'].iloc[-1] if not changes.empty else watermark
+        return changes, new_watermark
+    except _QUERY_ERRORS as e:
+        logger.error(f"Erro ao buscar propostas alteradas desde {watermark}: {e}", exc_info=True)
+        return None, watermark
+
+def count_proposals(status=None, clients=None, proposal_types=None, date_from=None, date_to=None):
+    """Conta as propostas que atendem aos filtros (os mesmos de query_proposals)."""
+    try:
+        where, params = _build_filters(status, clients, proposal_types, date_from, date_to)
+        return get_connection().execute(f"SELECT COUNT(*) FROM propostas{where}", params).fetchone()[0]
+    except _QUERY_ERRORS as e:
+        _query_failed(f"Erro ao contar propostas: {e}")
+        return 0
+
+# Colunas presentes na tabela de resumo (as demais agregações usam a tabela de propostas)
+SUMMARY_COLUMNS = ('status', 'nome_cliente', 'proposal_type')
+
+def aggregate_proposals(group_by=None, status=None, clients=None, proposal_types=None, date_from=None, date_to=None,
+                        order_by_value=False, limit=None):
+    """
+    Agrega as propostas filtradas (quantidade e valor total), opcionalmente agrupadas por uma coluna.
+    Com `order_by_value`, os grupos vêm do maior para o menor valor total.
+    Sem filtro de data, a consulta usa a tabela de resumo em vez de percorrer as propostas.
+    """
+    try:
+        where, params = _build_filters(status, clients, proposal_types, date_from, date_to)
+        use_summary = not (date_from or date_to) and group_by in (None,) + SUMMARY_COLUMNS
+        if use_summary:
+            table = "propostas_resumo"
+            select = "COALESCE(SUM(quantidade), 0) AS quantidade, COALESCE(SUM(valor_total), 0) AS valor_total"
+        else:
+            table = "propostas"
+            select = "COUNT(*) AS quantidade, COALESCE(SUM(valor_proposta), 0) AS valor_total"
+        if group_by is None:
+            return pd.read_sql_query(f"SELECT {select} FROM {table}{where}", get_connection(), params=params)
+        column = _check_column(group_by)
+        # Na tabela de resumo os valores nulos foram gravados como ''
+        label = f"NULLIF({column}, '') AS {column}" if use_summary else column
+        query = f"SELECT {label}, {select} FROM {table}{where} GROUP BY {column}"
+        query += " ORDER BY valor_total DESC" if order_by_value else f" ORDER BY {column}"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        return pd.read_sql_query(query, get_connection(), params=params)
+    except _QUERY_ERRORS as e:
+        _query_failed(f"Erro ao agregar propostas: {e}")
+        return pd.DataFrame()
+
+def get_proposal_kpis(status=None, clients=None, proposal_types=None, date_from=None, date_to=None):
+    """
+    Indicadores das propostas filtradas: quantidade, valor total, aceitas e taxa de aceitação (%).
+    """
+    by_status = aggregate_proposals('status', status, clients, proposal_types, date_from, date_to)
+    if by_status.empty:
+        return {"quantidade": 0, "valor_total": 0.0, "aceitas": 0, "taxa_aceitacao": 0.0}
+    total = int(by_status["quantidade"].sum())
+    accepted = int(by_status.loc[by_status["status"] == 'aceita', "quantidade"].sum())
+    return {
+        "quantidade": total,
+        "valor_total": float(by_status["valor_total"].sum()),
+        "aceitas": accepted,
+        "taxa_aceitacao": accepted / total * 100 if total else 0.0,
+    }
+
+def get_distinct_values(column):
+    """
+    Valores distintos de uma coluna (usado nas opções dos filtros).
+    Status, cliente e tipo são lidos da tabela de resumo, bem menor que a de propostas.
+    """
+    try:
+        column = _check_column(column)
+        table = "propostas_resumo" if column in SUMMARY_COLUMNS else "propostas"
+        rows = get_connection().execute(
+            f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL AND {column} != '' ORDER BY {column}"
+        ).fetchall()
+        return [row[0] for row in rows]
+    except _QUERY_ERRORS as e:
+        _query_failed(f"Erro ao buscar valores distintos de {column}: {e}")
+        return []
+
+def _fts_query(text):
+    """
+    Converte o texto digitado em uma consulta FTS5 segura: cada palavra vira um termo entre aspas
+    (todas precisam aparecer) e a última aceita prefixo, para a busca funcionar enquanto se digita.
+    Trechos entre aspas duplas são buscados como frase.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\w+)', text):
+        words = re.findall(r"\w+", phrase or word)
+        if words:
+            terms.append('"' + " ".join(words) + '"')
+    if terms and not terms[-1].count(" ") and not text.rstrip().endswith('"'):
+        terms[-1] += "*"
+    return " ".join(terms)
+
+def search_proposals(query, limit=20):
+    """
+    Busca propostas pelo conteúdo (cliente, produto, condições, resumo e texto extraído),
+    ordenadas por relevância (ou das mais recentes, para termos muito comuns; ver
+    SEARCH_RANK_MAX_MATCHES). Cada resultado traz um trecho com os termos encontrados em **negrito**.
+    """
+    match = _fts_query(query or "")
+    if not match:
+        return pd.DataFrame(columns=['id', 'nome_cliente', 'status', 'valor_proposta', 'trecho', 'relevancia'])
+    try:
+        conn = get_connection()
+        matches = conn.execute("SELECT COUNT(*) FROM propostas_fts WHERE propostas_fts MATCH ?", (match,)).fetchone()[0]
+        ranked = matches <= SEARCH_RANK_MAX_MATCHES
+        order = "rank" if ranked else "rowid DESC"
+        # A ordenação e o LIMIT são resolvidos dentro do índice; a junção com as
+        # propostas (e o cálculo dos trechos) acontece só para os resultados retornados
+        return pd.read_sql_query(f"""
+            SELECT p.id, p.nome_cliente, p.status, p.valor_proposta, r.trecho, r.relevancia
+            FROM (
+                SELECT rowid, snippet(propostas_fts, -1, '**', '**', '…', 16) AS trecho,
+                       {"rank" if ranked else "NULL"} AS relevancia
+                FROM propostas_fts
+                WHERE propostas_fts MATCH ?
+                ORDER BY {order}
+                LIMIT ?
+            ) AS r
+            JOIN propostas p ON p.id = r.rowid
+            ORDER BY {"r.relevancia" if ranked else "p.id DESC"}
+        """, conn, params=[match, int(limit)])
+    except _QUERY_ERRORS as e:
+        _query_failed(f"Erro na busca de propostas por '{query}': {e}")
+        return pd.DataFrame(columns=['id', 'nome_cliente', 'status', 'valor_proposta', 'trecho', 'relevancia'])
 
 def update_proposal_status(proposal_id, new_status):
     """
     Atualiza o status de uma proposta no banco de dados.
     """
-    conn = None
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE propostas
-            SET status = ?
-            WHERE id = ?
-        """, (new_status, proposal_id))
-        conn.commit()
+        with transaction() as cursor:
+            cursor.execute("""
+                UPDATE propostas
+                SET status = ?
+                WHERE id = ?
+            """, (new_status, proposal_id))
         logger.info(f"Status da proposta ID {proposal_id} atualizado para '{new_status}'.")
     except sqlite3.Error as e:
         logger.error(f"Erro ao atualizar status da proposta ID {proposal_id}: {e}", exc_info=True)
-    finally:
-        if conn:
-            conn.close()
+
+# Campos da proposta que podem ser alterados por update_proposal_details
+DETAIL_COLUMNS = ('nome_cliente', 'valor_proposta', 'produto_servico', 'proposal_type', 'condicoes', 'resumo_ia', 'analise_preditiva')
+
+def _update_details(cursor, proposal_id, new_data):
+    """Atualiza os campos fornecidos com o cursor informado. Retorna False se nenhum campo for válido."""
+    # Construir a query de forma dinâmica para atualizar apenas os campos fornecidos
+    set_clauses = []
+    values = []
+    for key, value in new_data.items():
+        if key in DETAIL_COLUMNS:
+            set_clauses.append(f"{key} = ?")
+            values.append(value)
+
+    if not set_clauses:
+        logger.warning(f"Nenhum campo válido fornecido para atualização da proposta ID {proposal_id}.")
+        return False
+
+    query = f"UPDATE propostas SET {', '.join(set_clauses)} WHERE id = ?"
+    values.append(proposal_id)
+    cursor.execute(query, tuple(values))
+    return True
 
 def update_proposal_details(proposal_id, new_data):
     """
     Atualiza os detalhes de uma proposta no banco de dados.
     """
-    conn = None
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Construir a query de forma dinâmica para atualizar apenas os campos fornecidos
-        set_clauses = []
-        values = []
-        for key, value in new_data.items():
-            if key in ['nome_cliente', 'valor_proposta', 'produto_servico', 'proposal_type', 'condicoes', 'resumo_ia', 'analise_preditiva']: # Adicione todos os campos que podem ser atualizados
-                set_clauses.append(f"{key} = ?")
-                values.append(value)
-        
-        if not set_clauses:
-            logger.warning(f"Nenhum campo válido fornecido para atualização da proposta ID {proposal_id}.")
-            return
-
-        query = f"UPDATE propostas SET {', '.join(set_clauses)} WHERE id = ?"
-        values.append(proposal_id)
-
-        cursor.execute(query, tuple(values))
-        conn.commit()
+    try:
+        with transaction() as cursor:
+            if not _update_details(cursor, proposal_id, new_data):
+                return
         logger.info(f"Detalhes da proposta ID {proposal_id} atualizados com sucesso.")
     except sqlite3.Error as e:
         logger.error(f"Erro ao atualizar detalhes da proposta ID {proposal_id}: {e}", exc_info=True)
-    finally:
-        if conn:
-            conn.close()
 
-def get_proposal_details(proposal_id):
+def get_proposal_details(proposal_id, include_text=False):
     """
     Busca os detalhes completos de uma proposta específica.
+    Com include_text=True, inclui também o texto extraído do PDF (campo 'texto_extraido').
     """
-    conn = None
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row # Permite acessar colunas pelo nome
-        cursor = conn.cursor()
+        cursor = get_connection().cursor()
+        cursor.row_factory = sqlite3.Row # Permite acessar colunas pelo nome
         cursor.execute("SELECT * FROM propostas WHERE id = ?", (proposal_id,))
         details = cursor.fetchone()
-        return dict(details) if details else None
+        if not details:
+            return None
+        details = dict(details)
+        if include_text:
+            details['texto_extraido'] = get_extracted_text(proposal_id)
+        return details
     except sqlite3.Error as e:
-        logger.error(f"Erro ao buscar detalhes da proposta: {e}", exc_info=True)
+        _query_failed(f"Erro ao buscar detalhes da proposta: {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
+
+def get_extracted_text(proposal_id):
+    """Texto extraído do PDF da proposta, ou None se não estiver guardado."""
+    try:
+        row = get_connection().execute("SELECT texto FROM propostas_texto WHERE proposta_id = ?", (proposal_id,)).fetchone()
+        return _decompress_text(row[0]) if row else None
+    except (sqlite3.Error, zlib.error) as e:
+        logger.error(f"Erro ao buscar o texto extraído da proposta ID {proposal_id}: {e}", exc_info=True)
+        return None
+
+def save_extracted_text(proposal_id, extracted_text, content_hash=None):
+    """Guarda (ou substitui) o texto extraído de uma proposta já registrada."""
+    try:
+        with transaction() as cursor:
+            if content_hash is None:
+                row = cursor.execute("SELECT content_hash FROM propostas WHERE id = ?", (proposal_id,)).fetchone()
+                content_hash = row[0] if row else None
+            _save_text(cursor, proposal_id, extracted_text, content_hash)
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Erro ao guardar o texto extraído da proposta ID {proposal_id}: {e}", exc_info=True)
+        return False
+
+# --- Reanálise em lote ---
+
+def create_reanalysis_run(proposal_ids, description=None):
+    """Registra uma execução de reanálise com as propostas selecionadas e retorna o ID da execução."""
+    proposal_ids = list(dict.fromkeys(int(proposal_id) for proposal_id in proposal_ids))
+    try:
+        with transaction() as cursor:
+            cursor.execute(
+                "INSERT INTO reanalise_execucoes (descricao, total) VALUES (?, ?)", (description, len(proposal_ids))
+            )
+            run_id = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO reanalise_itens (execucao_id, proposta_id) VALUES (?, ?)",
+                [(run_id, proposal_id) for proposal_id in proposal_ids],
+            )
+        logger.info(f"Execução de reanálise {run_id} criada com {len(proposal_ids)} propostas.")
+        return run_id
+    except sqlite3.Error as e:
+        logger.error(f"Erro ao criar a execução de reanálise: {e}", exc_info=True)
+        return None
+
+def get_reanalysis_runs():
+    """Lista as execuções de reanálise com a contagem de propostas por status."""
+    try:
+        return pd.read_sql_query("""
+            SELECT e.id, e.descricao, e.criada_em, e.total,
+                   SUM(i.status = 'concluida') AS concluidas,
+                   SUM(i.status = 'pendente') AS pendentes,
+                   SUM(i.status = 'falhou') AS falhas,
+                   SUM(i.status = 'sem_texto') AS sem_texto
+            FROM reanalise_execucoes e LEFT JOIN reanalise_itens i ON i.execucao_id = e.id
+            GROUP BY e.id ORDER BY e.id DESC
+        """, get_connection())
+    except _QUERY_ERRORS as e:
+        logger.error(f"Erro ao listar as execuções de reanálise: {e}", exc_info=True)
+        return pd.DataFrame()
+
+def get_reanalysis_pending(run_id, include_failed=True):
+    """IDs das propostas de uma execução que ainda precisam ser reanalisadas."""
+    statuses = ('pendente', 'falhou') if include_failed else ('pendente',)
+    try:
+        rows = get_connection().execute(
+            f"""SELECT proposta_id FROM reanalise_itens
+                WHERE execucao_id = ? AND status IN ({', '.join('?' * len(statuses))}) ORDER BY proposta_id""",
+            (run_id, *statuses),
+        ).fetchall()
+        return [row[0] for row in rows]
+    except sqlite3.Error as e:
+        logger.error(f"Erro ao buscar as propostas pendentes da reanálise {run_id}: {e}", exc_info=True)
+        return None
+
+def finish_reanalysis_item(run_id, proposal_id, new_data=None, status='concluida', error=None):
+    """
+    Grava o resultado da reanálise de uma proposta. Os novos dados (se houver) e o andamento
+    da execução são gravados na mesma transação: uma execução interrompida nunca fica com
+    uma proposta atualizada e marcada como pendente, nem o contrário.
+    """
+    try:
+        with transaction() as cursor:
+            if new_data:
+                _update_details(cursor, proposal_id, new_data)
+            cursor.execute(
+                "UPDATE reanalise_itens SET status = ?, erro = ?, atualizada_em = CURRENT_TIMESTAMP "
+                "WHERE execucao_id = ? AND proposta_id = ?",
+                (status, error, run_id, proposal_id),
+            )
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Erro ao gravar a reanálise da proposta ID {proposal_id}: {e}", exc_info=True)
+        return False
@@ -0,0 +1,210 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+import logging
+from . import logging_config
+
+logger = logging.getLogger(__name__)
+
+# Tempo (em segundos) que um arquivo precisa ficar sem mudar de tamanho para ser considerado completo
+SETTLE_TIME = float(os.getenv("WATCH_SETTLE_TIME", "0.2"))
+# Espera mínima entre duas verificações da pasta, para não girar em falso
+MIN_WAIT = 0.05
+
+# Constantes do inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _StabilityTracker:
+    """Acompanha arquivos candidatos e só os libera quando param de crescer."""
+
+    def __init__(self, settle_time):
+        self.settle_time = settle_time
+        self._pending = {}  # path -> (tamanho, mtime, instante da última mudança)
+
+    def touch(self, path):
+        """Registra (ou reinicia) a observação de um arquivo."""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self._pending.pop(path, None)
+            return
+        self._pending[path] = (stat.st_size, stat.st_mtime_ns, time.monotonic())
+
+    def __contains__(self, path):
+        return path in self._pending
+
+    def next_deadline(self):
+        """Segundos até o próximo arquivo pendente poder ser liberado."""
+        if not self._pending:
+            return None
+        now = time.monotonic()
+        return max(0.0, min(changed + self.settle_time - now for _, _, changed in self._pending.values()))
+
+    def pop_ready(self):
+        """Retorna os arquivos que ficaram estáveis pelo tempo mínimo."""
+        ready = []
+        now = time.monotonic()
+        for path, (size, mtime, changed) in list(self._pending.items()):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                del self._pending[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime):
+                self._pending[path] = (stat.st_size, stat.st_mtime_ns, now)
+            elif now - changed >= self.settle_time:
+                del self._pending[path]
+                # Arquivo vazio (ex.: cópia abortada): só volta a ser observado quando mudar
+                if stat.st_size > 0:
+                    ready.append(path)
+        return ready
+
+
+def _list_candidates(directory, suffix):
+    """Arquivos da pasta com a extensão informada, sem diferenciar maiúsculas de minúsculas."""
+    return {path for path in directory.iterdir() if path.is_file() and path.name.lower().endswith(suffix)}
+
+
+class PollingWatcher:
+    """Observa a pasta listando os PDFs periodicamente (modo de compatibilidade)."""
+
+    def __init__(self, directory, poll_interval=10, settle_time=SETTLE_TIME, suffix=".pdf"):
+        self.directory = Path(directory)
+        self.poll_interval = poll_interval
+        self.suffix = suffix.lower()
+        self._tracker = _StabilityTracker(settle_time)
+        self._reported = set()
+
+    def _scan(self):
+        current = _list_candidates(self.directory, self.suffix)
+        # Arquivos que saíram da pasta podem ser reenviados com o mesmo nome
+        self._reported &= current
+        for path in current - self._reported:
+            if path not in self._tracker:
+                self._tracker.touch(path)
+
+    def wait_for_files(self, timeout=None):
+        """
+        Bloqueia até que existam arquivos completos e os retorna.
+        Com `timeout`, retorna uma lista vazia se nada ficar pronto nesse intervalo.
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self._scan()
+            ready = self._tracker.pop_ready()
+            if ready:
+                self._reported.update(ready)
+                return sorted(ready)
+            deadline = self._tracker.next_deadline()
+            wait = self.poll_interval if deadline is None else max(deadline, MIN_WAIT)
+            if end is not None:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    return []
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Observa a pasta com inotify, reagindo a eventos de fechamento de escrita e de movimentação."""
+
+    def __init__(self, directory, settle_time=SETTLE_TIME, suffix=".pdf"):
+        self.directory = Path(directory)
+        self.suffix = suffix.lower()
+        self._tracker = _StabilityTracker(settle_time)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(self.directory), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch falhou para {self.directory}")
+        # Arquivos que já estavam na pasta antes do início da observação
+        self._rescan()
+
+    def _rescan(self):
+        for path in _list_candidates(self.directory, self.suffix):
+            self._tracker.touch(path)
+
+    def _read_events(self):
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(buffer):
+            _, mask, _, name_len = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = buffer[offset:offset + name_len].rstrip(b"\0").decode(errors="replace")
+            offset += name_len
+            if mask & IN_Q_OVERFLOW:
+                logger.warning("Fila de eventos do inotify estourou. Reescaneando a pasta.")
+                self._rescan()
+                continue
+            if not name.lower().endswith(self.suffix):
+                continue
+            self._tracker.touch(self.directory / name)
+
+    def wait_for_files(self, timeout=None):
+        """
+        Bloqueia até que existam arquivos completos e os retorna.
+        Com `timeout`, retorna uma lista vazia se nada ficar pronto nesse intervalo.
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            ready = self._tracker.pop_ready()
+            if ready:
+                return sorted(ready)
+            wait = self._tracker.next_deadline()
+            if wait is not None:
+                wait = max(wait, MIN_WAIT)
+            if end is not None:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    return []
+                wait = remaining if wait is None else min(wait, remaining)
+            readable, _, _ = select.select([self._fd], [], [], wait)
+            if readable:
+                self._read_events()
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(directory, mode="auto", poll_interval=10):
+    """
+    Cria o observador da pasta de entrada. No modo "auto" tenta o inotify e,
+    se não estiver disponível (ex.: fora do Linux), usa o polling.
+    """
+    if mode in ("auto", "inotify"):
+        try:
+            watcher = InotifyWatcher(directory)
+            logger.info(f"Observando '{directory}' com inotify.")
+            return watcher
+        except (OSError, AttributeError, TypeError) as e:
+            if mode == "inotify":
+                raise
+            logger.warning(f"inotify indisponível ({e}). Usando polling a cada {poll_interval}s.")
+    watcher = PollingWatcher(directory, poll_interval=poll_interval)
+    logger.info(f"Observando '{directory}' com polling a cada {poll_interval}s.")
+    return watcher
@@ -0,0 +1,223 @@
+import abc
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import logging
+from . import logging_config
+from . import ai_config_service
+
+logger = logging.getLogger(__name__)
+
+# Backend usado pelas análises: "gemini" (API do Google) ou "local" (substituto offline e determinístico)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+LOCAL_LLM_LATENCY_MS = float(os.getenv("LOCAL_LLM_LATENCY_MS", "0"))
+LOCAL_LLM_LATENCY_JITTER_MS = float(os.getenv("LOCAL_LLM_LATENCY_JITTER_MS", "0"))
+LOCAL_LLM_ERROR_RATE = float(os.getenv("LOCAL_LLM_ERROR_RATE", "0"))
+LOCAL_LLM_SEED = int(os.getenv("LOCAL_LLM_SEED", "42"))
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class LLMBackend(abc.ABC):
+    """Interface dos backends de IA: recebem o nome da tarefa e o prompt e devolvem o texto da resposta."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def model_name(self, task):
+        """Identificador do modelo usado na tarefa (faz parte da chave do cache)."""
+
+    @abc.abstractmethod
+    def generate(self, task, prompt):
+        """Gera a resposta para o prompt da tarefa."""
+
+    async def generate_async(self, task, prompt):
+        return await asyncio.to_thread(self.generate, task, prompt)
+
+
+class GeminiBackend(LLMBackend):
+    """Backend real, usando os modelos do registro em `ai_config_service`."""
+
+    name = "gemini"
+
+    def model_name(self, task):
+        return ai_config_service.get_model_name(task)
+
+    def generate(self, task, prompt):
+        return ai_config_service.get_model(task).generate_content(prompt).text
+
+    async def generate_async(self, task, prompt):
+        response = await ai_config_service.get_model(task).generate_content_async(prompt)
+        return response.text
+
+
+class LocalBackendError(Exception):
+    """Falha simulada pelo backend local. Usa o código 503 para ser tratada como temporária."""
+
+    code = 503
+
+
+class LocalBackend(LLMBackend):
+    """
+    Substituto offline do Gemini. Gera respostas determinísticas a partir do texto do prompt,
+    com latência e taxa de erro configuráveis, para testes de carga sem acesso à API.
+    """
+
+    name = "local"
+
+    def __init__(self, latency_ms=LOCAL_LLM_LATENCY_MS, jitter_ms=LOCAL_LLM_LATENCY_JITTER_MS,
+                 error_rate=LOCAL_LLM_ERROR_RATE, seed=LOCAL_LLM_SEED):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def model_name(self, task):
+        return "local-stand-in"
+
+    def _next_delay_and_failure(self):
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            fail = self.error_rate > 0 and self._random.random() < self.error_rate
+        return max(0.0, self.latency_ms + jitter) / 1000.0, fail
+
+    def generate(self, task, prompt):
+        delay, fail = self._next_delay_and_failure()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise LocalBackendError("Falha simulada pelo backend local (503).")
+        return build_local_response(task, prompt)
+
+    async def generate_async(self, task, prompt):
+        delay, fail = self._next_delay_and_failure()
+        if delay:
+            await asyncio.sleep(delay)
+        if fail:
+            raise LocalBackendError("Falha simulada pelo backend local (503).")
+        return build_local_response(task, prompt)
+
+
+# --- Respostas determinísticas do backend local ---
+
+_LABELS = ['aceita', 'recusada', 'pendente']
+_TYPE_KEYWORDS = [
+    ("Desenvolvimento de Software", ("desenvolvimento", "software", "sistema", "aplicativo", "website")),
+    ("Consultoria", ("consultoria", "diagnóstico", "assessoria")),
+    ("Manutenção", ("manutenção", "suporte", "sustentação")),
+    ("Licenciamento", ("licença", "licenciamento", "assinatura")),
+]
+_MONEY_PATTERN = re.compile(r"R\$\s*([\d\.]+(?:,\d{1,2})?)")
+
+
+def _digest(text):
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest(), 16)
+
+
+def _proposal_text(prompt):
+    """Recupera o texto da proposta, que os prompts colocam entre linhas '---'."""
+    match = re.search(r"---\s*\n(.*?)\n\s*---", prompt, re.DOTALL)
+    return match.group(1) if match else prompt
+
+
+def _parse_brl(value):
+    try:
+        return float(value.replace(".", "").replace(",", "."))
+    except ValueError:
+        return 0.0
+
+
+def _first_match(patterns, text, default):
+    for pattern in patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match and match.group(1).strip():
+            return match.group(1).strip()[:120]
+    return default
+
+
+def _local_extraction(text):
+    digest = _digest(text)
+    values = [_parse_brl(v) for v in _MONEY_PATTERN.findall(text)]
+    lowered = text.lower()
+    proposal_type = next(
+        (name for name, keywords in _TYPE_KEYWORDS if any(k in lowered for k in keywords)), "Outros"
+    )
+    conditions = [
+        line.strip() for line in text.splitlines()
+        if re.search(r"prazo|pagamento|validade|parcela", line, re.IGNORECASE)
+    ]
+    first_line = next((line.strip() for line in text.splitlines() if line.strip()), "N/A")
+    return {
+        "nome_cliente": _first_match([r"cliente\s*[:\-]\s*(.+)", r"empresa\s*[:\-]\s*(.+)", r"para\s*[:\-]\s*(.+)"],
+                                     text, f"Cliente {digest % 10000:04d}"),
+        "valor_proposta": max(values) if values else float(digest % 500000) / 10,
+        "produto_servico": _first_match([r"(?:objeto|produto|serviço|servico)\s*[:\-]\s*(.+)"], text, first_line[:120]),
+        "proposal_type": proposal_type,
+        "condicoes": "; ".join(conditions)[:400] if conditions else "N/A",
+    }
+
+
+def _local_summary(data):
+    return (
+        f"Proposta para {data.get('nome_cliente', 'N/A')} no valor de R$ {float(data.get('valor_proposta') or 0):.2f}, "
+        f"referente a {data.get('produto_servico', 'N/A')}. Condições: {data.get('condicoes', 'N/A')}."
+    )
+
+
+def _fields_from_data_block(prompt):
+    """Lê os campos do bloco 'Dados da Proposta' usado nos prompts de resumo e previsão."""
+    fields = {}
+    for key, label in [("nome_cliente", "Cliente"), ("produto_servico", "Produto/Serviço"), ("condicoes", "Condições")]:
+        fields[key] = _first_match([rf"- {re.escape(label)}(?:/Prazos)?:\s*(.+)"], prompt, "N/A")
+    fields["valor_proposta"] = _parse_brl(_first_match([r"- Valor: R\$\s*([\d\.,]+)"], prompt, "0").replace(".", ","))
+    return fields
+
+
+def build_local_response(task, prompt):
+    """Monta a resposta determinística do backend local para cada tarefa."""
+    label = _LABELS[_digest(prompt) % len(_LABELS)]
+    if task == "extracao":
+        return json.dumps(_local_extraction(_proposal_text(prompt)), ensure_ascii=False)
+    if task == "analise_combinada":
+        data = _local_extraction(_proposal_text(prompt))
+        data["resumo_ia"] = _local_summary(data)
+        data["previsao_aceitacao"] = label
+        return json.dumps(data, ensure_ascii=False)
+    if task == "resumo":
+        return _local_summary(_fields_from_data_block(prompt))
+    if task == "previsao":
+        return label
+    if task.startswith("resumo_pendentes"):
+        # O prompt final já traz os totais calculados sobre todas as pendentes
+        totals = re.search(r"Total de propostas pendentes: (\d+)\s*- Valor total envolvido: R\$ ([\d\.]+)", prompt)
+        if totals:
+            return f"Há {totals.group(1)} proposta(s) pendente(s), somando R$ {float(totals.group(2)):.2f}."
+        count = len(re.findall(r"^\s*- Cliente:", prompt, re.MULTILINE))
+        total = sum(_parse_brl(v.replace(".", ",")) for v in re.findall(r"Valor: R\$ ([\d\.]+)", prompt))
+        return f"Há {count} proposta(s) pendente(s), somando R$ {total:.2f}."
+    return f"Resposta local para a tarefa '{task}'."
+
+
+def get_backend():
+    """Retorna o backend de IA do processo, escolhido pela variável LLM_BACKEND."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = LocalBackend() if LLM_BACKEND == "local" else GeminiBackend()
+                logger.info(f"Backend de IA em uso: {_backend.name}.")
+    return _backend
+
+
+def set_backend(backend):
+    """Substitui o backend de IA do processo (ex.: em benchmarks)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
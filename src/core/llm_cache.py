@@ -0,0 +1,115 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+import logging
+from . import logging_config
+from .database_service import DB_DIR
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(DB_DIR, "llm_cache.db"))
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") not in ("0", "false", "False")
+CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+_lock = threading.Lock()
+_conn = None
+_stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+def _get_connection():
+    """Abre (uma única vez) a conexão com o banco do cache."""
+    global _conn
+    if _conn is None:
+        Path(CACHE_PATH).parent.mkdir(parents=True, exist_ok=True)
+        _conn = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                chave TEXT PRIMARY KEY,
+                resposta TEXT NOT NULL,
+                criado_em REAL NOT NULL,
+                ultimo_acesso REAL NOT NULL
+            )
+        """)
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_ultimo_acesso ON llm_cache (ultimo_acesso)")
+        _conn.commit()
+    return _conn
+
+def make_key(model_name, prompt_version, text):
+    """Gera a chave do cache a partir do modelo, da versão do prompt e do texto de entrada."""
+    digest = hashlib.sha256()
+    for part in (model_name, prompt_version, text):
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def get(key):
+    """Retorna a resposta armazenada para a chave, ou None se não houver (ou tiver expirado)."""
+    if not CACHE_ENABLED:
+        return None
+    try:
+        with _lock:
+            conn = _get_connection()
+            row = conn.execute("SELECT resposta, criado_em FROM llm_cache WHERE chave = ?", (key,)).fetchone()
+            now = time.time()
+            if row is None:
+                _stats["misses"] += 1
+                return None
+            if CACHE_TTL_SECONDS > 0 and now - row[1] > CACHE_TTL_SECONDS:
+                conn.execute("DELETE FROM llm_cache WHERE chave = ?", (key,))
+                conn.commit()
+                _stats["expired"] += 1
+                _stats["misses"] += 1
+                return None
+            conn.execute("UPDATE llm_cache SET ultimo_acesso = ? WHERE chave = ?", (now, key))
+            conn.commit()
+            _stats["hits"] += 1
+            return row[0]
+    except sqlite3.Error as e:
+        logger.error(f"Erro ao consultar o cache da IA: {e}", exc_info=True)
+        return None
+
+def put(key, response):
+    """Armazena uma resposta e remove as entradas menos usadas se o limite for excedido."""
+    if not CACHE_ENABLED:
+        return
+    try:
+        with _lock:
+            conn = _get_connection()
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (chave, resposta, criado_em, ultimo_acesso) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            excess = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - CACHE_MAX_ENTRIES
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM llm_cache WHERE chave IN (SELECT chave FROM llm_cache ORDER BY ultimo_acesso LIMIT ?)",
+                    (excess,),
+                )
+                _stats["evictions"] += excess
+            conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"Erro ao gravar no cache da IA: {e}", exc_info=True)
+
+def get_stats():
+    """Retorna os contadores de acertos/erros do cache e o número de entradas."""
+    stats = dict(_stats)
+    try:
+        with _lock:
+            stats["entries"] = _get_connection().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+    except sqlite3.Error:
+        stats["entries"] = None
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / total if total else 0.0
+    return stats
+
+def clear():
+    """Remove todas as entradas do cache."""
+    with _lock:
+        conn = _get_connection()
+        conn.execute("DELETE FROM llm_cache")
+        conn.commit()
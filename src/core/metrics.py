@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+from . import logging_config
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# Limites (em segundos) dos histogramas de latência
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Limites (em tokens estimados) do histograma de tamanho de prompt
+PROMPT_SIZE_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=None):
+    pairs = list(key) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Contador monotônico com rótulos."""
+
+    kind = "counter"
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Histograma cumulativo no formato do Prometheus (buckets, soma e contagem)."""
+
+    kind = "histogram"
+
+    def __init__(self, name, description, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self):
+        result = []
+        with self._lock:
+            for key, series in self._series.items():
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    result.append((f"{self.name}_bucket", key, count, {"le": repr(float(bound))}))
+                result.append((f"{self.name}_bucket", key, series["count"], {"le": "+Inf"}))
+                result.append((f"{self.name}_sum", key, series["sum"]))
+                result.append((f"{self.name}_count", key, series["count"]))
+        return result
+
+
+class Registry:
+    """Conjunto de métricas do processo, exportável no formato texto do Prometheus."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, description):
+        return self._register(name, lambda: Counter(name, description))
+
+    def histogram(self, name, description, buckets=LATENCY_BUCKETS):
+        return self._register(name, lambda: Histogram(name, description, buckets))
+
+    def _register(self, name, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+    def render_prometheus(self):
+        """Gera o texto de exposição (text/plain; version=0.0.4)."""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample in metric.samples():
+                name, key, value = sample[:3]
+                extra = sample[3] if len(sample) > 3 else None
+                lines.append(f"{name}{_format_labels(key, extra)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+files_processed = registry.counter("propostas_arquivos_processados_total", "Arquivos processados, por resultado.")
+stage_failures = registry.counter("propostas_falhas_total", "Falhas no pipeline, por etapa.")
+stage_duration = registry.histogram("propostas_etapa_duracao_segundos", "Duração de cada etapa do pipeline.")
+llm_latency = registry.histogram("propostas_ia_latencia_segundos", "Latência das chamadas ao backend de IA, por tarefa.")
+prompt_size = registry.histogram(
+    "propostas_ia_prompt_tokens", "Tamanho estimado (em tokens) dos prompts enviados à IA.", PROMPT_SIZE_BUCKETS
+)
+
+
+@contextmanager
+def timed(stage, **labels):
+    """
+    Mede a duração de uma etapa do pipeline. Se o bloco lançar uma exceção,
+    conta uma falha na etapa antes de repassá-la.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_failures.inc(stage=stage, **labels)
+        raise
+    finally:
+        stage_duration.observe(time.perf_counter() - start, stage=stage, **labels)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT, host="127.0.0.1"):
+    """Sobe o exportador Prometheus em uma thread de fundo. Retorna o servidor (ou None se falhar)."""
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.error(f"Não foi possível iniciar o exportador de métricas na porta {port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+    logger.info(f"Exportador de métricas disponível em http://{host}:{port}/metrics")
+    return server
+
+
+def parse_prometheus_text(text):
+    """
+    Converte o texto de exposição em uma lista de amostras
+    (nome, rótulos, valor), para exibição no painel.
+    """
+    samples = []
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name_and_labels, _, value = line.rpartition(" ")
+        labels = {}
+        name = name_and_labels
+        if "{" in name_and_labels:
+            name, _, raw = name_and_labels.partition("{")
+            for pair in raw.rstrip("}").split('",'):
+                if "=" in pair:
+                    key, _, label_value = pair.partition("=")
+                    labels[key.strip(",")] = label_value.strip('"').replace('\\"', '"').replace("\\\\", "\\")
+        try:
+            samples.append((name, labels, float(value)))
+        except ValueError:
+            continue
+    return samples
@@ -0,0 +1,301 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+import logging
+from . import logging_config
+from . import notification_service as notifier
+from .database_service import DB_DIR
+from .resilience import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+# Fila persistente das notificações (sobrevive a reinícios do serviço)
+NOTIFICATION_QUEUE_PATH = os.getenv("NOTIFICATION_QUEUE_PATH", os.path.join(DB_DIR, "notificacoes.db"))
+# Intervalo mínimo entre duas mensagens para o mesmo número
+NOTIFICATION_MIN_INTERVAL_SECONDS = float(os.getenv("NOTIFICATION_MIN_INTERVAL_SECONDS", "3"))
+# Modo resumo: junta até N propostas do mesmo número em uma só mensagem (0 ou 1 = desligado)
+NOTIFICATION_DIGEST_SIZE = int(os.getenv("NOTIFICATION_DIGEST_SIZE", "0"))
+# No modo resumo, quanto tempo a primeira proposta espera pelas seguintes antes do envio
+NOTIFICATION_DIGEST_WINDOW_SECONDS = float(os.getenv("NOTIFICATION_DIGEST_WINDOW_SECONDS", "30"))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+# Notificações "enviando" há mais tempo que isto são consideradas abandonadas (ex.: processo encerrado)
+NOTIFICATION_CLAIM_TIMEOUT_SECONDS = float(os.getenv("NOTIFICATION_CLAIM_TIMEOUT_SECONDS", "300"))
+
+
+class NotificationDispatcher:
+    """
+    Envia as notificações do WhatsApp em uma thread de fundo, a partir de uma fila em SQLite.
+    Quem chama `enqueue` apenas grava a notificação e segue adiante, sem esperar pela API.
+    O envio respeita um intervalo mínimo por destinatário (registrado na própria fila, valendo
+    para todos os processos que a usam), tenta de novo com backoff em caso de falha e, no modo
+    resumo, junta várias propostas do mesmo destinatário em uma mensagem. A API key não é
+    gravada na fila: ela é obtida da configuração no momento do envio.
+    """
+
+    def __init__(self, queue_path=None, min_interval=None, digest_size=None, digest_window=None,
+                 max_attempts=None, retry_policy=None):
+        self.queue_path = str(queue_path or NOTIFICATION_QUEUE_PATH)
+        self.min_interval = NOTIFICATION_MIN_INTERVAL_SECONDS if min_interval is None else min_interval
+        self.digest_size = NOTIFICATION_DIGEST_SIZE if digest_size is None else digest_size
+        self.digest_window = NOTIFICATION_DIGEST_WINDOW_SECONDS if digest_window is None else digest_window
+        self.max_attempts = NOTIFICATION_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=self.max_attempts, base_delay=2.0, max_delay=300.0)
+        # API keys informadas na chamada (ex.: digitadas no painel), apenas em memória.
+        # Só reivindica notificações de um número o processo que tem a API key dele.
+        self._api_keys = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._conn = self._open()
+
+    def _open(self):
+        Path(self.queue_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.queue_path, check_same_thread=False, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS notificacoes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                telefone TEXT NOT NULL,
+                dados TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pendente',
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                criada_em REAL NOT NULL,
+                proxima_tentativa REAL NOT NULL,
+                atualizada_em REAL,
+                erro TEXT
+            )
+        """)
+        # Filas criadas por versões anteriores guardavam a API key em cada notificação
+        if "api_key" in [row[1] for row in conn.execute("PRAGMA table_info(notificacoes)")]:
+            conn.execute("ALTER TABLE notificacoes DROP COLUMN api_key")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_notificacoes_status ON notificacoes (status, proxima_tentativa)")
+        # Último envio para cada número, compartilhado entre os processos que usam a fila
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS envios (
+                telefone TEXT PRIMARY KEY,
+                ultimo_envio REAL NOT NULL
+            )
+        """)
+        conn.commit()
+        return conn
+
+    # --- Fila ---
+
+    def enqueue(self, data, whatsapp_phone_number=None, whatsapp_api_key=None):
+        """Grava a notificação de uma proposta na fila. Retorna o ID na fila, ou None se não houver destinatário."""
+        phone, api_key = notifier.resolve_recipient(whatsapp_phone_number, whatsapp_api_key)
+        if not api_key or not phone:
+            logger.warning("Chaves de API ou número de telefone do WhatsApp não configurados. Pulando notificação.")
+            return None
+        if whatsapp_api_key:
+            self._api_keys[phone] = whatsapp_api_key
+        payload = {key: data.get(key) for key in ("id", "nome_cliente", "valor_proposta", "resumo_ia")}
+        now = time.time()
+        # No modo resumo, a notificação aguarda a janela para juntar-se às seguintes
+        due = now + self.digest_window if self.digest_size > 1 else now
+        try:
+            with self._lock, self._conn:
+                cursor = self._conn.execute(
+                    "INSERT INTO notificacoes (telefone, dados, criada_em, proxima_tentativa) VALUES (?, ?, ?, ?)",
+                    (phone, json.dumps(payload, ensure_ascii=False), now, due),
+                )
+            self._wakeup.set()
+            return cursor.lastrowid
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao enfileirar notificação: {e}", exc_info=True)
+            return None
+
+    def pending_count(self):
+        """Quantidade de notificações ainda não entregues (pendentes ou em envio)."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM notificacoes WHERE status IN ('pendente', 'enviando')").fetchone()[0]
+
+    def _claim_batch(self, now):
+        """
+        Reserva as próximas notificações a enviar: as do destinatário com a notificação vencida
+        mais antiga, respeitando o intervalo mínimo. Retorna (lote, segundos até a próxima).
+        """
+        with self._lock, self._conn:
+            # Trava de escrita: outro processo (ex.: o painel) pode estar lendo a mesma fila
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute("""
+                SELECT n.telefone, MIN(n.proxima_tentativa), COUNT(*), COALESCE(e.ultimo_envio, 0)
+                FROM notificacoes n LEFT JOIN envios e ON e.telefone = n.telefone
+                WHERE n.status = 'pendente' GROUP BY n.telefone ORDER BY 2
+            """).fetchall()
+            next_wait = None
+            for phone, due, count, last_sent in rows:
+                if not self._api_key_for(phone):
+                    # Outro processo (ex.: o painel onde a key foi digitada) enviará estas notificações
+                    continue
+                earliest = last_sent + self.min_interval
+                # No modo resumo, um lote completo não precisa esperar o fim da janela
+                full = self.digest_size > 1 and count >= self.digest_size
+                ready_at = earliest if full else max(due, earliest)
+                if ready_at > now:
+                    next_wait = ready_at - now if next_wait is None else min(next_wait, ready_at - now)
+                    continue
+                # No modo resumo entram também as propostas ainda dentro da própria janela
+                cutoff = now + self.digest_window if self.digest_size > 1 else now
+                batch = self._conn.execute("""
+                    SELECT id, telefone, dados, tentativas FROM notificacoes
+                    WHERE status = 'pendente' AND telefone = ? AND proxima_tentativa <= ?
+                    ORDER BY id LIMIT ?
+                """, (phone, cutoff, max(1, self.digest_size))).fetchall()
+                if not batch:
+                    continue
+                ids = [row[0] for row in batch]
+                self._conn.execute(
+                    f"UPDATE notificacoes SET status = 'enviando', atualizada_em = ? WHERE id IN ({', '.join('?' * len(ids))})",
+                    [now, *ids],
+                )
+                # O envio é registrado na reserva, ainda com a trava: outro processo já respeita o intervalo
+                self._conn.execute(
+                    "INSERT INTO envios (telefone, ultimo_envio) VALUES (?, ?) "
+                    "ON CONFLICT (telefone) DO UPDATE SET ultimo_envio = excluded.ultimo_envio",
+                    (phone, now),
+                )
+                return batch, 0.0
+            return [], next_wait
+
+    def _finish_batch(self, batch, delivered, error=None):
+        ids = [row[0] for row in batch]
+        placeholders = ", ".join("?" * len(ids))
+        now = time.time()
+        with self._lock, self._conn:
+            if delivered:
+                self._conn.execute(f"DELETE FROM notificacoes WHERE id IN ({placeholders})", ids)
+                return
+            attempts = max(row[3] for row in batch) + 1
+            if attempts >= self.max_attempts:
+                logger.error(f"Notificações {ids} descartadas após {attempts} tentativas.")
+                self._conn.execute(
+                    f"UPDATE notificacoes SET status = 'falhou', tentativas = ?, atualizada_em = ?, erro = ? WHERE id IN ({placeholders})",
+                    [attempts, now, error, *ids],
+                )
+                return
+            delay = self.retry_policy.compute_delay(attempts - 1)
+            logger.warning(f"Falha ao enviar notificações {ids}. Nova tentativa em {delay:.1f}s.")
+            self._conn.execute(
+                f"""UPDATE notificacoes SET status = 'pendente', tentativas = ?, proxima_tentativa = ?,
+                    atualizada_em = ?, erro = ? WHERE id IN ({placeholders})""",
+                [attempts, now + delay, now, error, *ids],
+            )
+
+    def _release_batch(self, batch):
+        """Devolve o lote à fila sem contar uma tentativa (o envio nem chegou a ser feito)."""
+        ids = [row[0] for row in batch]
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE notificacoes SET status = 'pendente' WHERE id IN ({', '.join('?' * len(ids))})", ids
+            )
+
+    def _release_abandoned(self):
+        """Devolve à fila as notificações que ficaram 'enviando' (ex.: o processo foi encerrado no meio)."""
+        with self._lock, self._conn:
+            released = self._conn.execute(
+                "UPDATE notificacoes SET status = 'pendente' WHERE status = 'enviando' AND atualizada_em < ?",
+                (time.time() - NOTIFICATION_CLAIM_TIMEOUT_SECONDS,),
+            ).rowcount
+        if released:
+            logger.info(f"{released} notificações abandonadas voltaram para a fila.")
+
+    # --- Envio ---
+
+    def _api_key_for(self, phone):
+        """API key para o número: a informada neste processo ou, se for o número configurado, a da configuração."""
+        if phone in self._api_keys:
+            return self._api_keys[phone]
+        configured_phone, configured_key = notifier.resolve_recipient()
+        return configured_key if phone == configured_phone else None
+
+    def _send_batch(self, batch):
+        phone = batch[0][1]
+        items = [json.loads(row[2]) for row in batch]
+        message = notifier.build_message(items[0]) if len(items) == 1 else notifier.build_digest_message(items)
+        api_key = self._api_key_for(phone)
+        if not api_key:
+            logger.warning(f"API key do WhatsApp indisponível para o número {phone}. Notificações devolvidas à fila.")
+            self._release_batch(batch)
+            return
+        try:
+            delivered = notifier.send_whatsapp_message(api_key, phone, message)
+            self._finish_batch(batch, delivered, None if delivered else "Falha no envio pela API CallMeBot.")
+        except Exception as e:
+            logger.error("Erro inesperado ao enviar notificação.", exc_info=True)
+            self._finish_batch(batch, False, str(e))
+
+    def process_due(self):
+        """Envia todas as notificações já liberadas. Retorna os segundos até a próxima (ou None se a fila esvaziou)."""
+        while not self._stopping.is_set():
+            batch, wait = self._claim_batch(time.time())
+            if not batch:
+                return wait
+            self._send_batch(batch)
+        return None
+
+    def _run(self):
+        self._release_abandoned()
+        while not self._stopping.is_set():
+            try:
+                wait = self.process_due()
+            except sqlite3.Error as e:
+                logger.error(f"Erro ao ler a fila de notificações: {e}", exc_info=True)
+                wait = 5.0
+            self._wakeup.wait(timeout=wait if wait is not None else NOTIFICATION_CLAIM_TIMEOUT_SECONDS)
+            self._wakeup.clear()
+
+    def start(self):
+        """Inicia a thread de envio (se ainda não estiver rodando)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def flush(self, timeout=None):
+        """Aguarda até a fila esvaziar (ou o tempo acabar). Retorna True se tudo foi entregue ou descartado."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._wakeup.set()
+        while self.pending_count():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self, timeout=5.0):
+        """Para a thread de envio. As notificações não enviadas continuam na fila para a próxima execução."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """Retorna o despachante do processo, criando-o e iniciando a thread de envio na primeira chamada."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher().start()
+        return _dispatcher
+
+
+def set_dispatcher(dispatcher):
+    """Substitui o despachante do processo (ex.: fila temporária no benchmark)."""
+    global _dispatcher
+    with _dispatcher_lock:
+        _dispatcher = dispatcher
+
+
+def enqueue_notification(data, whatsapp_phone_number=None, whatsapp_api_key=None):
+    """Enfileira a notificação de uma proposta para envio em segundo plano."""
+    return get_dispatcher().enqueue(data, whatsapp_phone_number, whatsapp_api_key)
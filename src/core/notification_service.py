@@ -1,5 +1,7 @@
 import os
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from urllib.parse import quote
 import logging
@@ -8,47 +10,90 @@ from . import logging_config
 logger = logging.getLogger(__name__)
 load_dotenv()
 
-def send_notification(data, whatsapp_phone_number=None, whatsapp_api_key=None):
-    """
-    Prepara e envia a notificação para o WhatsApp.
-    """
-    # Prioriza os parâmetros passados, senão usa as variáveis de ambiente
+# Endereço da API do CallMeBot (pode apontar para um servidor local em testes)
+CALLMEBOT_API_URL = os.getenv("CALLMEBOT_API_URL", "https://api.callmebot.com/whatsapp.php")
+# Tempos limite (em segundos) para conectar e para receber a resposta da API
+NOTIFICATION_CONNECT_TIMEOUT = float(os.getenv("NOTIFICATION_CONNECT_TIMEOUT", "5"))
+NOTIFICATION_READ_TIMEOUT = float(os.getenv("NOTIFICATION_READ_TIMEOUT", "15"))
+NOTIFICATION_POOL_SIZE = int(os.getenv("NOTIFICATION_POOL_SIZE", "4"))
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Sessão HTTP compartilhada, que reaproveita as conexões com a API entre as mensagens."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=NOTIFICATION_POOL_SIZE, pool_maxsize=NOTIFICATION_POOL_SIZE)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+def resolve_recipient(whatsapp_phone_number=None, whatsapp_api_key=None):
+    """Retorna (telefone, api_key), priorizando os parâmetros e usando as variáveis de ambiente como padrão."""
     phone_to_use = whatsapp_phone_number if whatsapp_phone_number else os.getenv("WHATSAPP_PHONE_NUMBER")
     api_key_to_use = whatsapp_api_key if whatsapp_api_key else os.getenv("WHATSAPP_API_KEY")
+    return phone_to_use, api_key_to_use
 
-    if not api_key_to_use or not phone_to_use:
-        logger.warning("Chaves de API ou número de telefone do WhatsApp não configurados. Pulando notificação.")
-        return
-
+def build_message(data):
+    """Monta o texto da notificação de uma proposta."""
     resumo = data.get('resumo_ia', 'Resumo não disponível.')
     cliente = data.get('nome_cliente', 'N/A')
-    valor = data.get('valor_proposta', 0.0)
-    
-    message = (
+    valor = data.get('valor_proposta') or 0.0
+
+    return (
         f"🤖 *Nova Proposta Processada* 🤖\n\n"
         f"👤 *Cliente:* {cliente}\n"
         f"💰 *Valor:* R$ {valor:.2f}\n\n"
         f"📄 *Resumo Automático:*\n_{resumo}_"
     )
-    
-    send_whatsapp_message(api_key_to_use, phone_to_use, message)
+
+def build_digest_message(items):
+    """Monta uma única mensagem com várias propostas (modo resumo), uma linha por proposta."""
+    total = sum(item.get('valor_proposta') or 0.0 for item in items)
+    lines = [
+        f"🤖 *{len(items)} Novas Propostas Processadas* 🤖",
+        f"💰 *Valor total:* R$ {total:.2f}",
+        "",
+    ]
+    for item in items:
+        lines.append(f"👤 {item.get('nome_cliente', 'N/A')} – R$ {item.get('valor_proposta') or 0.0:.2f}")
+    return "\n".join(lines)
+
+def send_notification(data, whatsapp_phone_number=None, whatsapp_api_key=None):
+    """
+    Prepara e envia a notificação para o WhatsApp, aguardando a resposta da API.
+    O pipeline usa o notification_dispatcher, que envia em segundo plano.
+    """
+    phone_to_use, api_key_to_use = resolve_recipient(whatsapp_phone_number, whatsapp_api_key)
+
+    if not api_key_to_use or not phone_to_use:
+        logger.warning("Chaves de API ou número de telefone do WhatsApp não configurados. Pulando notificação.")
+        return False
+
+    return send_whatsapp_message(api_key_to_use, phone_to_use, build_message(data))
 
 def send_whatsapp_message(api_key, phone_number, text):
     """
     Envia uma mensagem de texto para um número do WhatsApp usando a API CallMeBot.
+    Retorna True se a API confirmou o envio.
     """
     encoded_text = quote(text)
-    url = f"https://api.callmebot.com/whatsapp.php?phone={phone_number}&text={encoded_text}&apikey={api_key}"
+    url = f"{CALLMEBOT_API_URL}?phone={phone_number}&text={encoded_text}&apikey={api_key}"
     
     logger.info(f"Enviando notificação para o WhatsApp número: {phone_number}")
     try:
-        response = requests.get(url, verify=False)
+        response = get_session().get(url, verify=False, timeout=(NOTIFICATION_CONNECT_TIMEOUT, NOTIFICATION_READ_TIMEOUT))
         response.raise_for_status()
         
         if "ERROR" in response.text.upper():
              logger.error(f"Erro retornado pela API CallMeBot: {response.text}")
-        else:
-             logger.info("Notificação enviada para o WhatsApp com sucesso.")
+             return False
+        logger.info("Notificação enviada para o WhatsApp com sucesso.")
+        return True
 
     except requests.exceptions.RequestException as e:
         logger.error("Erro ao conectar com a API do CallMeBot.", exc_info=True)
+        return False
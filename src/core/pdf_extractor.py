@@ -1,22 +1,87 @@
-
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF
 import logging
 from . import logging_config
+from .text_reducer import CHARS_PER_TOKEN
 
 logger = logging.getLogger(__name__)
 
-def extract_text_from_pdf(pdf_path):
+# Limite padrão de caracteres extraídos por documento (0 = sem limite)
+PDF_TEXT_MAX_CHARS = int(os.getenv("PDF_TEXT_MAX_CHARS", "0"))
+# A partir de quantas páginas a extração é dividida entre processos
+PDF_PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", "150"))
+PDF_EXTRACTION_PROCESSES = int(os.getenv("PDF_EXTRACTION_PROCESSES", str(min(4, os.cpu_count() or 1))))
+
+def get_page_count(pdf_path):
+    """Retorna o número de páginas do PDF."""
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+def iter_page_texts(pdf_path, start=0, end=None):
+    """
+    Gera o texto de cada página do PDF, uma de cada vez, sem manter o documento inteiro em memória.
+    `start` e `end` delimitam o intervalo de páginas (base zero, `end` exclusivo).
+    """
+    with fitz.open(pdf_path) as doc:
+        end = doc.page_count if end is None else min(end, doc.page_count)
+        for number in range(start, end):
+            page = doc.load_page(number)
+            yield page.get_text()
+
+def iter_text(pdf_path, max_chars=None, max_tokens=None):
+    """
+    Gera o texto do PDF página a página, parando assim que o orçamento de caracteres
+    (ou de tokens estimados) for atingido.
+    """
+    budget = _char_budget(max_chars, max_tokens)
+    for text in iter_page_texts(pdf_path):
+        if budget is not None:
+            if budget <= 0:
+                return
+            text = text[:budget]
+            budget -= len(text)
+        yield text
+
+def _char_budget(max_chars, max_tokens):
+    budgets = [limit for limit in (max_chars, max_tokens * CHARS_PER_TOKEN if max_tokens else None) if limit]
+    return min(budgets) if budgets else None
+
+def _extract_page_range(pdf_path, start, end):
+    # Executado em um processo separado: precisa ser uma função de módulo (serializável)
+    return "".join(iter_page_texts(pdf_path, start, end))
+
+def _extract_parallel(pdf_path, page_count, processes):
+    """Divide as páginas em intervalos e extrai cada um em um processo, mantendo a ordem."""
+    chunk = -(-page_count // processes)
+    ranges = [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+    with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+        parts = pool.map(_extract_page_range, [str(pdf_path)] * len(ranges), *zip(*ranges))
+        return "".join(parts)
+
+def extract_text(pdf_path, max_chars=None, max_tokens=None, parallel=None):
     """
-    Extrai o texto de todas as páginas de um arquivo PDF.
+    Extrai o texto do PDF. Com orçamento, a leitura para cedo; sem orçamento, documentos
+    grandes (acima de PDF_PARALLEL_PAGE_THRESHOLD páginas) são divididos entre processos.
+    Lança a exceção original se o PDF não puder ser lido.
+    """
+    budget = _char_budget(max_chars, max_tokens)
+    if budget is None and parallel is not False and PDF_EXTRACTION_PROCESSES > 1:
+        # Dentro de um processo do pool do pipeline não criamos outro pool
+        in_worker = multiprocessing.parent_process() is not None
+        page_count = get_page_count(pdf_path)
+        if parallel or (not in_worker and page_count >= PDF_PARALLEL_PAGE_THRESHOLD):
+            logger.info(f"Extraindo {page_count} páginas de {pdf_path} em {PDF_EXTRACTION_PROCESSES} processos.")
+            return _extract_parallel(pdf_path, page_count, PDF_EXTRACTION_PROCESSES)
+    return "".join(iter_text(pdf_path, max_chars=max_chars, max_tokens=max_tokens))
+
+def extract_text_from_pdf(pdf_path, max_chars=None, max_tokens=None):
+    """
+    Extrai o texto de todas as páginas de um arquivo PDF (ou até o orçamento informado).
     """
     try:
-        doc = fitz.open(pdf_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        doc.close()
-        return text
+        return extract_text(pdf_path, max_chars=max_chars or PDF_TEXT_MAX_CHARS or None, max_tokens=max_tokens)
     except Exception as e:
         logger.error(f"Erro ao processar o PDF {pdf_path}", exc_info=True)
         return None
-
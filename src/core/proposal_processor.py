@@ -1,42 +1,223 @@
 
 import os
 import json
-import google.generativeai as genai
-from dotenv import load_dotenv
+import asyncio
+import hashlib
+import threading
+import time
+import weakref
 import logging
+import numpy as np
+import pandas as pd
 from . import logging_config
-from .ai_config_service import configure_ai
+from . import llm_backend
+from . import llm_cache
+from .rate_limiter import RateLimiter
+from .text_reducer import estimate_tokens
+from . import resilience
+from . import metrics
+from . import text_reducer
+from . import acceptance_model
+from .resilience import TransientAIError
 
 logger = logging.getLogger(__name__)
-load_dotenv()
 
-def analyze_proposal(text):
+# Versão de cada template de prompt. Altere ao mudar o texto de um prompt para invalidar o cache.
+PROMPT_VERSIONS = {
+    "extracao": "1",
+    "resumo": "1",
+    "previsao": "1",
+    "analise_combinada": "1",
+    "resumo_pendentes": "2",
+    "resumo_pendentes_parcial": "1",
+}
+
+# Modo da análise: "combinado" (uma única chamada) ou "separado" (extração, resumo e previsão)
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "combinado").lower()
+
+PROPOSAL_TYPES = ["Desenvolvimento de Software", "Consultoria", "Manutenção", "Licenciamento", "Outros"]
+PREDICTION_LABELS = ['aceita', 'recusada', 'pendente']
+# Texto gravado no lugar do resumo quando a IA não consegue gerá-lo
+SUMMARY_ERROR_MESSAGE = "Não foi possível gerar o resumo."
+
+# Campos esperados na resposta da análise combinada e seus tipos
+ANALYSIS_SCHEMA = {
+    'nome_cliente': str,
+    'valor_proposta': float,
+    'produto_servico': str,
+    'proposal_type': str,
+    'condicoes': str,
+    'resumo_ia': str,
+    'previsao_aceitacao': str,
+}
+
+# Limites da API assíncrona: chamadas simultâneas, requisições e tokens por minuto
+ASYNC_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+GEMINI_TOKENS_PER_MINUTE = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+
+# Resumo das propostas pendentes: acima deste número de propostas, a lista é resumida em blocos
+PENDING_SUMMARY_CHUNK_SIZE = int(os.getenv("PENDING_SUMMARY_CHUNK_SIZE", "200"))
+# Quantos resumos parciais são combinados por chamada em cada nível da hierarquia
+PENDING_SUMMARY_FAN_IN = int(os.getenv("PENDING_SUMMARY_FAN_IN", "10"))
+PENDING_SUMMARY_TOP_N = 5
+
+# Cota de requisições/tokens por minuto, única no processo: vale para as chamadas síncronas
+# (ex.: threads do pipeline concorrente) e assíncronas, em qualquer event loop
+rate_limiter = RateLimiter(GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE)
+# Os semáforos do asyncio pertencem a um event loop: um por loop (o Streamlit pode usar um loop por execução)
+_async_semaphores = weakref.WeakKeyDictionary()
+
+def _is_valid_json(text):
+    try:
+        json.loads(_strip_json_fences(text))
+        return True
+    except ValueError:
+        return False
+
+def _strip_json_fences(text):
+    return text.strip().replace("```json", "").replace("```", "")
+
+def _cache_key(task, prompt):
+    backend = llm_backend.get_backend()
+    return llm_cache.make_key(f"{backend.name}:{backend.model_name(task)}", PROMPT_VERSIONS[task], prompt)
+
+def _generate_text(task, prompt, validator=None):
+    """
+    Envia o prompt ao backend de IA e retorna o texto da resposta, consultando antes o cache persistente.
+    Só armazena no cache respostas aprovadas pelo validador (quando informado).
+    """
+    key = _cache_key(task, prompt)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        logger.info(f"Resposta da IA ({task}) obtida do cache.")
+        return cached
+
+    rate_limiter.acquire(estimate_tokens(prompt))
+    metrics.prompt_size.observe(estimate_tokens(prompt), task=task)
+    start = time.perf_counter()
+    text = resilience.call_with_retry(
+        llm_backend.get_backend().generate, task, prompt, breaker=resilience.gemini_breaker
+    )
+    metrics.llm_latency.observe(time.perf_counter() - start, task=task)
+    if validator is None or validator(text):
+        llm_cache.put(key, text)
+    return text
+
+def validate_analysis(data):
     """
-    Orquestra a análise completa: extração e resumo.
+    Valida e normaliza a resposta da análise combinada.
+    Lança ValueError se algum campo obrigatório estiver ausente ou com tipo inválido.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("A resposta da análise não é um objeto JSON.")
+
+    missing = [field for field in ANALYSIS_SCHEMA if field not in data]
+    if missing:
+        raise ValueError(f"Campos ausentes na resposta da análise: {', '.join(missing)}")
+
+    result = {}
+    for field, expected_type in ANALYSIS_SCHEMA.items():
+        value = data[field]
+        if expected_type is float:
+            if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                raise ValueError(f"Campo '{field}' deveria ser numérico: {value!r}")
+            try:
+                value = float(value) if value not in ("", "N/A") else 0.0
+            except ValueError:
+                raise ValueError(f"Campo '{field}' deveria ser numérico: {value!r}")
+        elif not isinstance(value, str):
+            raise ValueError(f"Campo '{field}' deveria ser texto: {value!r}")
+        result[field] = value
+
+    if result['proposal_type'] not in PROPOSAL_TYPES:
+        result['proposal_type'] = "Outros"
+    prediction = result['previsao_aceitacao'].strip().lower()
+    if prediction not in PREDICTION_LABELS:
+        raise ValueError(f"Previsão inválida na resposta da análise: {prediction!r}")
+    result['previsao_aceitacao'] = prediction
+    return result
+
+def _build_combined_prompt(text):
+    return f"""
+    Você é um assistente especialista em análise de propostas comerciais. Analise o texto da proposta abaixo e responda com UM objeto JSON.
+
+    Texto da Proposta:
+    ---
+    {text}
+    ---
+
+    O objeto JSON deve conter exatamente os seguintes campos:
+    - "nome_cliente" (texto): O nome da empresa ou pessoa para quem a proposta é destinada.
+    - "valor_proposta" (número): O valor total da proposta, sem símbolos de moeda. Se houver múltiplos valores, use o valor total.
+    - "produto_servico" (texto): Uma breve descrição do principal produto ou serviço ofertado.
+    - "proposal_type" (texto): Uma das tags: "Desenvolvimento de Software", "Consultoria", "Manutenção", "Licenciamento" ou "Outros".
+    - "condicoes" (texto): Um resumo das principais condições, como prazos de entrega, validade da proposta ou formas de pagamento.
+    - "resumo_ia" (texto): Um resumo executivo conciso (3-4 frases), em português, para um gerente de vendas ocupado, destacando os pontos mais importantes para uma tomada de decisão rápida.
+    - "previsao_aceitacao" (texto): A previsão se a proposta será "aceita", "recusada" ou "pendente", considerando o cliente, o valor, o tipo de proposta e as condições.
+
+    Se uma informação não for encontrada, use o valor "N/A" para textos ou 0.0 para o valor.
+    Responda APENAS com o objeto JSON, sem nenhum texto ou formatação adicional.
     """
-    # 1. Extrair dados brutos com a IA
-    structured_data = extract_structured_data(text)
+
+def _is_valid_analysis(response_text):
+    try:
+        validate_analysis(json.loads(_strip_json_fences(response_text)))
+        return True
+    except ValueError:
+        return False
+
+def _analyze_combined(text):
+    """Faz a extração, o resumo e a previsão em uma única chamada à IA."""
+    response_text = _generate_text(
+        "analise_combinada", _build_combined_prompt(text), validator=_is_valid_analysis
+    )
+    return validate_analysis(json.loads(_strip_json_fences(response_text)))
+
+def _analyze_multi_call(text, include_prediction=True, strict=False):
+    """Caminho com chamadas separadas: extração, resumo e (opcionalmente) previsão."""
+    structured_data = extract_structured_data(text, reduce=False)
     if not structured_data:
         return None
 
-    # 2. Gerar resumo final com IA
-    summary = generate_summary(structured_data)
-
-    # 3. Combinar todos os dados em um resultado final
-    final_result = structured_data
-    final_result['resumo_ia'] = summary
-    
-    return final_result
+    structured_data['resumo_ia'] = generate_summary(structured_data)
+    if strict and structured_data['resumo_ia'] == SUMMARY_ERROR_MESSAGE:
+        logger.warning("Resumo não gerado; análise descartada (modo estrito).")
+        return None
+    if include_prediction:
+        structured_data['previsao_aceitacao'] = predict_acceptance(structured_data)
+    return structured_data
 
-def extract_structured_data(text):
+def analyze_proposal(text, include_prediction=True, mode=None, strict=False):
     """
-    Usa o Gemini para extrair informações estruturadas do texto de uma proposta.
+    Orquestra a análise completa: extração, resumo e previsão de aceitação.
+    No modo "combinado" tudo é obtido em uma única chamada à IA; se a resposta não passar
+    na validação, usa o caminho com chamadas separadas.
+    Com strict=True, retorna None se o resumo não puder ser gerado, em vez de usar o texto
+    de substituição (ex.: na reanálise, para não sobrescrever um resumo bom).
+    Lança TransientAIError se a IA estiver temporariamente indisponível.
     """
-    try:
-        configure_ai()
-        model = genai.GenerativeModel('gemini-1.5-flash')
+    mode = mode or ANALYSIS_MODE
+    text = text_reducer.reduce_text(text)
+    if mode == "combinado":
+        try:
+            result = _analyze_combined(text)
+            logger.info("Análise combinada concluída em uma única chamada.")
+            if not include_prediction:
+                result.pop('previsao_aceitacao', None)
+            else:
+                # Uma previsão confiável do modelo local prevalece sobre a da IA
+                result['previsao_aceitacao'] = _predict_locally(result) or result['previsao_aceitacao']
+            return result
+        except TransientAIError:
+            raise
+        except Exception as e:
+            logger.warning(f"Análise combinada falhou ({e}). Usando chamadas separadas.")
+
+    return _analyze_multi_call(text, include_prediction=include_prediction, strict=strict)
 
-        prompt = f"""
+def _build_extraction_prompt(text):
+    return f"""
         Você é um assistente especialista em análise de propostas comerciais. Sua tarefa é extrair as seguintes informações do texto abaixo e retorná-las em formato JSON.
 
         Texto da Proposta:
@@ -55,23 +236,28 @@ def extract_structured_data(text):
         Responda APENAS com o objeto JSON, sem nenhum texto ou formatação adicional.
         """
 
-        response = model.generate_content(prompt)
-        json_response = response.text.strip().replace("```json", "").replace("```", "")
-        return json.loads(json_response)
-    except Exception as e:
-        logger.error("Erro ao extrair dados com a IA.", exc_info=True)
-        logger.debug(f"Resposta recebida da API que causou o erro: {response.text if 'response' in locals() else 'N/A'}")
-        return None
+def _parse_extraction(response_text):
+    return json.loads(_strip_json_fences(response_text))
 
-def generate_summary(structured_data):
+def extract_structured_data(text, reduce=True):
     """
-    Usa o Gemini para gerar um resumo inteligente da proposta.
+    Usa o Gemini para extrair informações estruturadas do texto de uma proposta.
+    Com reduce=False o texto é usado como veio (quem chama já o reduziu, ex.: `analyze_proposal`).
+    Lança TransientAIError se a IA estiver temporariamente indisponível.
     """
     try:
-        configure_ai()
-        model = genai.GenerativeModel('gemini-1.5-flash')
+        prompt = _build_extraction_prompt(text_reducer.reduce_text(text) if reduce else text)
+        response_text = _generate_text("extracao", prompt, validator=_is_valid_json)
+        return _parse_extraction(response_text)
+    except TransientAIError:
+        raise
+    except Exception as e:
+        logger.error("Erro ao extrair dados com a IA.", exc_info=True)
+        logger.debug(f"Resposta recebida da API que causou o erro: {response_text if 'response_text' in locals() else 'N/A'}")
+        return None
 
-        prompt = f"""
+def _build_summary_prompt(structured_data):
+    return f"""
         Com base nos seguintes dados de uma proposta comercial, crie um resumo executivo para um gerente de vendas ocupado.
         O resumo deve ser conciso (3-4 frases), em português, e destacar os pontos mais importantes para uma tomada de decisão rápida.
 
@@ -83,21 +269,21 @@ def generate_summary(structured_data):
 
         Seja direto e informativo.
         """
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        logger.error("Erro ao gerar resumo com a IA.", exc_info=True)
-        return "Não foi possível gerar o resumo."
 
-def predict_acceptance(structured_data):
+def generate_summary(structured_data):
     """
-    Usa o Gemini para prever se a proposta será aceita, recusada ou pendente.
+    Usa o Gemini para gerar um resumo inteligente da proposta.
     """
     try:
-        configure_ai()
-        model = genai.GenerativeModel('gemini-1.5-flash')
+        return _generate_text("resumo", _build_summary_prompt(structured_data))
+    except TransientAIError:
+        raise
+    except Exception as e:
+        logger.error("Erro ao gerar resumo com a IA.", exc_info=True)
+        return SUMMARY_ERROR_MESSAGE
 
-        prompt = f"""
+def _build_prediction_prompt(structured_data):
+    return f"""
         Com base nos seguintes dados de uma proposta comercial, preveja se ela será 'aceita', 'recusada' ou 'pendente'.
         Considere o cliente, o valor, o tipo de proposta e as condições.
         Responda APENAS com uma das palavras: 'aceita', 'recusada' ou 'pendente'.
@@ -109,48 +295,374 @@ def predict_acceptance(structured_data):
         - Tipo de Proposta: {structured_data.get('proposal_type', 'N/A')}
         - Condições: {structured_data.get('condicoes', 'N/A')}
         """
-        response = model.generate_content(prompt)
-        prediction = response.text.strip().lower()
-        if prediction in ['aceita', 'recusada', 'pendente']:
-            logger.info(f"Previsão de aceitação gerada: {prediction}")
-            return prediction
-        else:
-            logger.warning(f"Previsão inesperada da IA: {prediction}. Retornando 'pendente'.")
-            return "pendente"
+
+def _is_valid_prediction(response_text):
+    return response_text.strip().lower() in PREDICTION_LABELS
+
+def _parse_prediction(response_text):
+    prediction = response_text.strip().lower()
+    if prediction in PREDICTION_LABELS:
+        logger.info(f"Previsão de aceitação gerada: {prediction}")
+        return prediction
+    logger.warning(f"Previsão inesperada da IA: {prediction}. Retornando 'pendente'.")
+    return "pendente"
+
+def _predict_locally(structured_data):
+    """Previsão do modelo local de aceitação, ou None se não houver modelo ou a confiança for baixa."""
+    try:
+        result = acceptance_model.predict_one(structured_data)
+    except Exception as e:
+        logger.error(f"Erro na previsão do modelo local de aceitação: {e}", exc_info=True)
+        return None
+    if result is None:
+        return None
+    prediction, confidence = result
+    if confidence < acceptance_model.ACCEPTANCE_MIN_CONFIDENCE:
+        logger.info(f"Previsão local '{prediction}' com confiança baixa ({confidence:.2f}).")
+        return None
+    logger.info(f"Previsão de aceitação do modelo local: {prediction} (confiança {confidence:.2f}).")
+    return prediction
+
+def predict_acceptance(structured_data):
+    """
+    Prevê se a proposta será aceita, recusada ou pendente. Usa primeiro o modelo local
+    (acceptance_model); sem modelo treinado ou com confiança baixa, pergunta ao Gemini.
+    """
+    local_prediction = _predict_locally(structured_data)
+    if local_prediction:
+        return local_prediction
+    if not acceptance_model.ACCEPTANCE_LLM_FALLBACK:
+        return "pendente"
+    try:
+        response_text = _generate_text(
+            "previsao", _build_prediction_prompt(structured_data), validator=_is_valid_prediction,
+        )
+        return _parse_prediction(response_text)
     except Exception as e:
         logger.error(f"Erro ao prever aceitação com a IA: {e}", exc_info=True)
         return "pendente"
 
-def summarize_pending_proposals(proposals_df):
+def _text_column(proposals_df, column):
+    if column not in proposals_df.columns:
+        return pd.Series("N/A", index=proposals_df.index)
+    return proposals_df[column].fillna("N/A").astype(str)
+
+def _value_column(proposals_df):
+    if 'valor_proposta' not in proposals_df.columns:
+        return pd.Series(0.0, index=proposals_df.index)
+    return pd.to_numeric(proposals_df['valor_proposta'], errors='coerce').fillna(0.0)
+
+def compute_pending_stats(proposals_df, top_n=PENDING_SUMMARY_TOP_N):
     """
-    Usa o Gemini para gerar um resumo das propostas pendentes.
-    Recebe um DataFrame de propostas pendentes.
+    Calcula localmente os totais das propostas pendentes: quantidade, valor total,
+    principais clientes (por valor) e principais produtos/serviços (por quantidade).
     """
-    if proposals_df.empty:
-        return "Não há propostas pendentes no momento."
+    values = _value_column(proposals_df)
+    top_clients = values.groupby(_text_column(proposals_df, 'nome_cliente')).sum().nlargest(top_n)
+    top_products = _text_column(proposals_df, 'produto_servico').value_counts().head(top_n)
+    return {
+        'quantidade': len(proposals_df),
+        'valor_total': float(values.sum()),
+        'principais_clientes': list(top_clients.items()),
+        'principais_produtos': list(top_products.items()),
+    }
 
-    model = genai.GenerativeModel('gemini-1.5-flash')
+def _format_pending_rows(proposals_df):
+    lines = (
+        "- Cliente: " + _text_column(proposals_df, 'nome_cliente')
+        + ", Valor: R$ " + _value_column(proposals_df).map("{:.2f}".format)
+        + ", Produto: " + _text_column(proposals_df, 'produto_servico')
+        + ", Status: " + _text_column(proposals_df, 'status')
+    )
+    return "\n".join(lines)
 
-    # Constrói uma string com os dados das propostas pendentes
-    proposals_text = ""
-    for index, row in proposals_df.iterrows():
-        proposals_text += f"- Cliente: {row.get('nome_cliente', 'N/A')}, Valor: R$ {row.get('valor_proposta', 0.0):.2f}, Produto: {row.get('produto_servico', 'N/A')}, Status: {row.get('status', 'N/A')}\n"
+def _format_pending_stats(stats):
+    clients = "; ".join(f"{name} (R$ {value:.2f})" for name, value in stats['principais_clientes'])
+    products = "; ".join(f"{name} ({count})" for name, count in stats['principais_produtos'])
+    return (
+        f"- Total de propostas pendentes: {stats['quantidade']}\n"
+        f"- Valor total envolvido: R$ {stats['valor_total']:.2f}\n"
+        f"- Principais clientes por valor: {clients}\n"
+        f"- Principais produtos/serviços: {products}"
+    )
 
-    prompt = f"""
-    Com base na lista de propostas pendentes abaixo, crie um resumo conciso (máximo 100 palavras)
-    destacando o número total de propostas pendentes, o valor total envolvido e os principais clientes ou produtos/serviços.
+def _build_pending_chunk_prompt(proposals_text):
+    return f"""
+    Resuma em no máximo 60 palavras o bloco de propostas pendentes abaixo, destacando
+    os clientes, os produtos/serviços e os valores mais relevantes.
 
-    Propostas Pendentes:
+    Propostas:
     ---
     {proposals_text}
     ---
+    """
+
+def _build_pending_merge_prompt(summaries):
+    partial_text = "\n".join(f"- {summary.strip()}" for summary in summaries)
+    return f"""
+    Combine os resumos parciais de propostas pendentes abaixo em um único resumo de no máximo 80 palavras,
+    mantendo os clientes, os produtos/serviços e os valores mais relevantes.
+
+    Resumos parciais:
+    ---
+    {partial_text}
+    ---
+    """
+
+def _build_pending_summary_prompt(stats, details):
+    return f"""
+    Com base nos totais e nos detalhes das propostas pendentes abaixo, crie um resumo conciso (máximo 100 palavras)
+    destacando o número total de propostas pendentes, o valor total envolvido e os principais clientes ou produtos/serviços.
+    Os totais foram calculados sobre todas as propostas pendentes: use-os exatamente como informados.
+
+    Totais:
+    ---
+    {_format_pending_stats(stats)}
+    ---
+
+    Detalhes:
+    ---
+    {details}
+    ---
 
     Seja direto e informativo.
     """
+
+def _pending_chunks(proposals_df):
+    size = max(1, PENDING_SUMMARY_CHUNK_SIZE)
+    return [proposals_df.iloc[start:start + size] for start in range(0, len(proposals_df), size)]
+
+def _group_summaries(summaries):
+    fan_in = max(2, PENDING_SUMMARY_FAN_IN)
+    return [summaries[start:start + fan_in] for start in range(0, len(summaries), fan_in)]
+
+def _format_partial_summaries(summaries):
+    return "\n".join(f"- Bloco {number}: {summary.strip()}" for number, summary in enumerate(summaries, 1))
+
+def pending_digest_key(proposals_df):
+    """
+    Chave do conjunto de propostas pendentes: muda quando uma proposta entra ou sai
+    da lista ou quando alguma delas é alterada (updated_at), independentemente da ordem.
+    """
+    columns = [column for column in ('id', 'updated_at') if column in proposals_df.columns]
+    if 'id' not in columns:
+        columns = list(proposals_df.columns)
+    row_hashes = np.sort(pd.util.hash_pandas_object(proposals_df[columns], index=False).to_numpy())
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+# Último resumo gerado no processo, para não reconsultar nem o cache em disco a cada execução do painel
+_pending_summary_memo = {}
+_pending_summary_lock = threading.Lock()
+
+def _get_cached_pending_summary(proposals_df):
+    digest = pending_digest_key(proposals_df)
+    with _pending_summary_lock:
+        if _pending_summary_memo.get('digest') == digest:
+            return digest, _pending_summary_memo['summary']
+    return digest, llm_cache.get(_cache_key("resumo_pendentes", f"pendentes:{digest}"))
+
+def get_cached_pending_summary(proposals_df):
+    """Resumo já gerado para este conjunto de pendentes, ou None. Não chama a IA."""
+    if proposals_df.empty:
+        return "Não há propostas pendentes no momento."
+    try:
+        return _get_cached_pending_summary(proposals_df)[1]
+    except Exception as e:
+        logger.error(f"Erro ao consultar o resumo de propostas pendentes em cache: {e}", exc_info=True)
+        return None
+
+def _store_pending_summary(digest, summary):
+    llm_cache.put(_cache_key("resumo_pendentes", f"pendentes:{digest}"), summary)
+    with _pending_summary_lock:
+        _pending_summary_memo.update(digest=digest, summary=summary)
+
+def summarize_pending_proposals(proposals_df):
+    """
+    Usa o Gemini para gerar um resumo das propostas pendentes.
+    Recebe um DataFrame de propostas pendentes. Os totais são calculados localmente; listas
+    longas são resumidas em blocos e os resumos parciais combinados em níveis. O resultado
+    fica em cache até o conjunto de pendentes (ids e updated_at) mudar.
+    """
+    if proposals_df.empty:
+        return "Não há propostas pendentes no momento."
+
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        digest, cached = _get_cached_pending_summary(proposals_df)
+        if cached is not None:
+            logger.info("Resumo das propostas pendentes obtido do cache.")
+            return cached
+
+        stats = compute_pending_stats(proposals_df)
+        if len(proposals_df) <= PENDING_SUMMARY_CHUNK_SIZE:
+            details = _format_pending_rows(proposals_df)
+        else:
+            summaries = [
+                _generate_text("resumo_pendentes_parcial", _build_pending_chunk_prompt(_format_pending_rows(chunk)))
+                for chunk in _pending_chunks(proposals_df)
+            ]
+            while len(summaries) > PENDING_SUMMARY_FAN_IN:
+                summaries = [
+                    _generate_text("resumo_pendentes_parcial", _build_pending_merge_prompt(group))
+                    for group in _group_summaries(summaries)
+                ]
+            details = _format_partial_summaries(summaries)
+
+        summary = _generate_text("resumo_pendentes", _build_pending_summary_prompt(stats, details))
+        _store_pending_summary(digest, summary)
+        return summary
     except Exception as e:
         logger.error(f"Erro ao gerar resumo de propostas pendentes com a IA: {e}", exc_info=True)
         return "Não foi possível gerar o resumo das propostas pendentes."
 
+# --- API assíncrona ---
+
+def _get_async_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _async_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _async_semaphores[loop] = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+    return semaphore
+
+async def _generate_text_async(task, prompt, validator=None):
+    """
+    Versão assíncrona de `_generate_text`: respeita o limite de chamadas simultâneas
+    e a cota de requisições/tokens por minuto antes de chamar o modelo.
+    """
+    key = _cache_key(task, prompt)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        logger.info(f"Resposta da IA ({task}) obtida do cache.")
+        return cached
+
+    async with _get_async_semaphore():
+        await rate_limiter.acquire_async(estimate_tokens(prompt))
+        metrics.prompt_size.observe(estimate_tokens(prompt), task=task)
+        start = time.perf_counter()
+        text = await resilience.call_with_retry_async(
+            llm_backend.get_backend().generate_async, task, prompt, breaker=resilience.gemini_breaker
+        )
+        metrics.llm_latency.observe(time.perf_counter() - start, task=task)
+    if validator is None or validator(text):
+        llm_cache.put(key, text)
+    return text
+
+async def extract_structured_data_async(text, reduce=True):
+    """Versão assíncrona de `extract_structured_data`."""
+    try:
+        prompt = _build_extraction_prompt(text_reducer.reduce_text(text) if reduce else text)
+        response_text = await _generate_text_async("extracao", prompt, validator=_is_valid_json)
+        return _parse_extraction(response_text)
+    except TransientAIError:
+        raise
+    except Exception as e:
+        logger.error("Erro ao extrair dados com a IA.", exc_info=True)
+        return None
+
+async def generate_summary_async(structured_data):
+    """Versão assíncrona de `generate_summary`."""
+    try:
+        return await _generate_text_async("resumo", _build_summary_prompt(structured_data))
+    except TransientAIError:
+        raise
+    except Exception as e:
+        logger.error("Erro ao gerar resumo com a IA.", exc_info=True)
+        return SUMMARY_ERROR_MESSAGE
+
+async def predict_acceptance_async(structured_data):
+    """Versão assíncrona de `predict_acceptance`."""
+    local_prediction = _predict_locally(structured_data)
+    if local_prediction:
+        return local_prediction
+    if not acceptance_model.ACCEPTANCE_LLM_FALLBACK:
+        return "pendente"
+    try:
+        response_text = await _generate_text_async(
+            "previsao", _build_prediction_prompt(structured_data), validator=_is_valid_prediction,
+        )
+        return _parse_prediction(response_text)
+    except Exception as e:
+        logger.error(f"Erro ao prever aceitação com a IA: {e}", exc_info=True)
+        return "pendente"
+
+async def summarize_pending_proposals_async(proposals_df):
+    """Versão assíncrona de `summarize_pending_proposals`; os blocos são resumidos em paralelo."""
+    if proposals_df.empty:
+        return "Não há propostas pendentes no momento."
+    try:
+        digest, cached = _get_cached_pending_summary(proposals_df)
+        if cached is not None:
+            logger.info("Resumo das propostas pendentes obtido do cache.")
+            return cached
+
+        stats = compute_pending_stats(proposals_df)
+        if len(proposals_df) <= PENDING_SUMMARY_CHUNK_SIZE:
+            details = _format_pending_rows(proposals_df)
+        else:
+            summaries = await asyncio.gather(*(
+                _generate_text_async("resumo_pendentes_parcial", _build_pending_chunk_prompt(_format_pending_rows(chunk)))
+                for chunk in _pending_chunks(proposals_df)
+            ))
+            while len(summaries) > PENDING_SUMMARY_FAN_IN:
+                summaries = await asyncio.gather(*(
+                    _generate_text_async("resumo_pendentes_parcial", _build_pending_merge_prompt(group))
+                    for group in _group_summaries(summaries)
+                ))
+            details = _format_partial_summaries(summaries)
+
+        summary = await _generate_text_async("resumo_pendentes", _build_pending_summary_prompt(stats, details))
+        _store_pending_summary(digest, summary)
+        return summary
+    except Exception as e:
+        logger.error(f"Erro ao gerar resumo de propostas pendentes com a IA: {e}", exc_info=True)
+        return "Não foi possível gerar o resumo das propostas pendentes."
+
+async def analyze_proposal_async(text, include_prediction=True, mode=None, strict=False):
+    """Versão assíncrona de `analyze_proposal`."""
+    mode = mode or ANALYSIS_MODE
+    text = text_reducer.reduce_text(text)
+    if mode == "combinado":
+        try:
+            response_text = await _generate_text_async(
+                "analise_combinada", _build_combined_prompt(text), validator=_is_valid_analysis
+            )
+            result = validate_analysis(json.loads(_strip_json_fences(response_text)))
+            if not include_prediction:
+                result.pop('previsao_aceitacao', None)
+            else:
+                result['previsao_aceitacao'] = _predict_locally(result) or result['previsao_aceitacao']
+            return result
+        except TransientAIError:
+            raise
+        except Exception as e:
+            logger.warning(f"Análise combinada falhou ({e}). Usando chamadas separadas.")
+
+    structured_data = await extract_structured_data_async(text, reduce=False)
+    if not structured_data:
+        return None
+    if include_prediction:
+        summary, prediction = await asyncio.gather(
+            generate_summary_async(structured_data), predict_acceptance_async(structured_data)
+        )
+        structured_data['previsao_aceitacao'] = prediction
+    else:
+        summary = await generate_summary_async(structured_data)
+    if strict and summary == SUMMARY_ERROR_MESSAGE:
+        logger.warning("Resumo não gerado; análise descartada (modo estrito).")
+        return None
+    structured_data['resumo_ia'] = summary
+    return structured_data
+
+async def analyze_many_async(texts, include_prediction=True):
+    """
+    Analisa vários textos ao mesmo tempo, respeitando os limites de concorrência e de cota.
+    Retorna os resultados na mesma ordem dos textos (None para os que falharem).
+    """
+    results = await asyncio.gather(
+        *(analyze_proposal_async(text, include_prediction=include_prediction) for text in texts),
+        return_exceptions=True,
+    )
+    for index, result in enumerate(results):
+        if isinstance(result, BaseException):
+            logger.error(f"Falha na análise do item {index} do lote: {result}")
+            results[index] = None
+    return results
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import time
+import logging
+from . import logging_config
+
+logger = logging.getLogger(__name__)
+
+
+class _TokenBucket:
+    """Balde de fichas com reposição contínua, medido em unidades por minuto."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Segundos até haver `amount` fichas disponíveis (0 se já houver)."""
+        self._refill()
+        missing = amount - self.tokens
+        return max(0.0, missing / self.rate) if missing > 0 else 0.0
+
+    def consume(self, amount):
+        self.tokens -= amount
+
+
+class RateLimiter:
+    """
+    Limita as chamadas à IA por requisições e por tokens por minuto. Uma única instância é
+    compartilhada por todas as threads e event loops do processo: `acquire` (síncrono) e
+    `acquire_async` consomem a mesma cota.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self._requests = _TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = _TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens):
+        """
+        Reserva uma requisição e `tokens` tokens e retorna quantos segundos esperar antes de usá-los.
+        A cota é debitada na hora (o saldo pode ficar negativo), então os pedidos seguintes
+        esperam a sua vez sem que a trava fique presa durante a espera.
+        """
+        with self._lock:
+            waits = [0.0]
+            if self._requests:
+                waits.append(self._requests.wait_time(1))
+            if self._tokens:
+                # Um pedido maior que a cota inteira nunca caberia no balde
+                tokens = min(tokens, self._tokens.capacity)
+                waits.append(self._tokens.wait_time(tokens))
+            if self._requests:
+                self._requests.consume(1)
+            if self._tokens:
+                self._tokens.consume(tokens)
+            return max(waits)
+
+    def acquire(self, tokens=1):
+        """Aguarda (bloqueando a thread) até haver cota para uma requisição de `tokens` tokens."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            logger.debug(f"Limite de taxa da IA atingido. Aguardando {wait:.2f}s.")
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=1):
+        """Versão assíncrona de `acquire`: aguarda sem bloquear o event loop."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            logger.debug(f"Limite de taxa da IA atingido. Aguardando {wait:.2f}s.")
+            await asyncio.sleep(wait)
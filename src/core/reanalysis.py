@@ -0,0 +1,231 @@
+import argparse
+import asyncio
+import os
+import logging
+from . import logging_config
+from . import database_service as database
+from . import pdf_extractor
+from . import proposal_processor as analysis_processor
+from .resilience import TransientAIError
+
+logger = logging.getLogger(__name__)
+
+# Quantas propostas são reanalisadas ao mesmo tempo (os limites de cota da IA continuam valendo)
+REANALYSIS_WORKERS = int(os.getenv("REANALYSIS_WORKERS", "4"))
+# Pasta dos PDFs já processados, usada quando a proposta não tem o texto extraído guardado
+REANALYSIS_PDF_DIR = os.getenv("REANALYSIS_PDF_DIR", os.path.join(database.project_root, "propostas_processadas"))
+
+# Campos regravados pela reanálise (o status, decidido pelas pessoas, não é alterado)
+REANALYZED_FIELDS = ('nome_cliente', 'valor_proposta', 'produto_servico', 'proposal_type', 'condicoes', 'resumo_ia')
+
+
+def select_proposals(ids=None, id_from=None, id_to=None, status=None, clients=None, proposal_types=None,
+                     date_from=None, date_to=None):
+    """IDs das propostas que atendem aos filtros, em ordem crescente."""
+    df = database.query_proposals(
+        status=status, clients=clients, proposal_types=proposal_types, date_from=date_from, date_to=date_to,
+        columns=['id'], order_by='id', descending=False,
+    )
+    selected = df['id']
+    if ids:
+        selected = selected[selected.isin(ids)]
+    if id_from is not None:
+        selected = selected[selected >= id_from]
+    if id_to is not None:
+        selected = selected[selected <= id_to]
+    return [int(proposal_id) for proposal_id in selected]
+
+
+def load_text(proposal):
+    """Texto da proposta: o guardado no banco ou, se não houver, o do PDF na pasta de processados."""
+    text = database.get_extracted_text(proposal['id'])
+    if text:
+        return text
+    file_name = proposal.get('nome_arquivo')
+    pdf_path = os.path.join(REANALYSIS_PDF_DIR, file_name) if file_name else None
+    if pdf_path and os.path.isfile(pdf_path):
+        logger.info(f"Proposta ID {proposal['id']} sem texto guardado; extraindo de '{pdf_path}'.")
+        text = pdf_extractor.extract_text_from_pdf(pdf_path)
+        if text:
+            # Guardado para que as próximas reanálises não precisem abrir o PDF
+            database.save_extracted_text(proposal['id'], text, proposal.get('content_hash'))
+        return text
+    return None
+
+
+def diff_fields(current, new_data):
+    """Campos que mudariam com a nova análise: {campo: (valor atual, valor novo)}."""
+    changes = {}
+    for field in REANALYZED_FIELDS:
+        if field not in new_data:
+            continue
+        old, new = current.get(field), new_data[field]
+        if field == 'valor_proposta' and old is not None and new is not None:
+            if abs(float(old) - float(new)) < 0.005:
+                continue
+        elif (old or '') == (new or ''):
+            continue
+        changes[field] = (old, new)
+    return changes
+
+
+def _short(value, width=80):
+    text = " ".join(str(value).split()) if value is not None else "—"
+    return text if len(text) <= width else text[:width - 1] + "…"
+
+
+def format_diff(proposal_id, changes):
+    if not changes:
+        return f"#{proposal_id}: sem alterações"
+    lines = [f"#{proposal_id}:"]
+    for field, (old, new) in changes.items():
+        lines.append(f"  {field}: {_short(old)!r} -> {_short(new)!r}")
+    return "\n".join(lines)
+
+
+async def reanalyze_one(proposal_id):
+    """
+    Reanalisa uma proposta a partir do texto extraído. Retorna (dados atuais, novos dados, erro);
+    novos dados é None quando não há texto disponível ou a análise falhou.
+    """
+    current = database.get_proposal_details(proposal_id)
+    if not current:
+        return None, None, "Proposta não encontrada."
+    text = await asyncio.to_thread(load_text, current)
+    if not text:
+        return current, None, "Texto extraído indisponível."
+    try:
+        # Modo estrito: uma parte que falhe descarta a análise em vez de gravar textos de substituição
+        result = await analysis_processor.analyze_proposal_async(text, include_prediction=False, strict=True)
+    except TransientAIError as e:
+        return current, None, f"Erro temporário da IA: {e}"
+    if not result:
+        return current, None, "A IA não retornou uma análise válida."
+    return current, {field: result[field] for field in REANALYZED_FIELDS if field in result}, None
+
+
+async def run_reanalysis(run_id, workers=REANALYSIS_WORKERS, include_failed=True):
+    """
+    Reanalisa as propostas ainda não concluídas da execução, até `workers` ao mesmo tempo.
+    Cada proposta é gravada (dados e andamento) assim que termina, então uma execução
+    interrompida pode ser retomada sem refazer as já concluídas. Retorna a contagem por status.
+    """
+    pending = database.get_reanalysis_pending(run_id, include_failed=include_failed)
+    if pending is None:
+        return None
+    logger.info(f"Reanálise {run_id}: {len(pending)} propostas a processar com {workers} em paralelo.")
+    semaphore = asyncio.Semaphore(max(1, workers))
+    counts = {'concluida': 0, 'falhou': 0, 'sem_texto': 0}
+
+    async def process(proposal_id):
+        async with semaphore:
+            try:
+                _, new_data, error = await reanalyze_one(proposal_id)
+            except Exception as e:
+                logger.error(f"Erro inesperado ao reanalisar a proposta ID {proposal_id}.", exc_info=True)
+                new_data, error = None, str(e)
+        if new_data:
+            status = 'concluida'
+        else:
+            status = 'sem_texto' if error == "Texto extraído indisponível." else 'falhou'
+        if database.finish_reanalysis_item(run_id, proposal_id, new_data, status=status, error=error):
+            counts[status] += 1
+            logger.info(f"Reanálise {run_id}: proposta ID {proposal_id} {status}." + (f" ({error})" if error else ""))
+
+    await asyncio.gather(*(process(proposal_id) for proposal_id in pending))
+    return counts
+
+
+async def dry_run(proposal_ids, workers=REANALYSIS_WORKERS):
+    """
+    Reanalisa as propostas sem gravar nada e retorna {id: alterações}, com as alterações no formato
+    de `diff_fields` (ou a mensagem de erro). As respostas da IA ficam no cache, então uma execução
+    real logo em seguida não repete as chamadas.
+    """
+    semaphore = asyncio.Semaphore(max(1, workers))
+
+    async def process(proposal_id):
+        async with semaphore:
+            try:
+                current, new_data, error = await reanalyze_one(proposal_id)
+            except Exception as e:
+                logger.error(f"Erro inesperado ao simular a reanálise da proposta ID {proposal_id}.", exc_info=True)
+                return proposal_id, f"Erro inesperado: {e}"
+        return proposal_id, diff_fields(current, new_data) if new_data else error
+
+    return dict(await asyncio.gather(*(process(proposal_id) for proposal_id in proposal_ids)))
+
+
+# --- Linha de comando ---
+
+def _parse_ids(value):
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reanálise em lote das propostas já registradas.")
+    parser.add_argument("--ids", type=_parse_ids, help="IDs separados por vírgula (ex.: 3,7,12).")
+    parser.add_argument("--de-id", type=int, help="Menor ID a reanalisar.")
+    parser.add_argument("--ate-id", type=int, help="Maior ID a reanalisar.")
+    parser.add_argument("--status", action="append", help="Status das propostas (pode ser repetido).")
+    parser.add_argument("--cliente", action="append", help="Cliente (pode ser repetido).")
+    parser.add_argument("--tipo", action="append", help="Tipo de proposta (pode ser repetido).")
+    parser.add_argument("--desde", help="Processadas a partir desta data (AAAA-MM-DD).")
+    parser.add_argument("--ate", help="Processadas até esta data (AAAA-MM-DD).")
+    parser.add_argument("--paralelo", type=int, default=REANALYSIS_WORKERS, help="Propostas reanalisadas ao mesmo tempo.")
+    parser.add_argument("--simular", action="store_true", help="Mostra as alterações sem gravar nada.")
+    parser.add_argument("--retomar", type=int, metavar="EXECUCAO", help="Retoma uma execução interrompida.")
+    parser.add_argument("--listar", action="store_true", help="Lista as execuções de reanálise.")
+    args = parser.parse_args()
+    database.setup_database()
+
+    if args.listar:
+        runs = database.get_reanalysis_runs()
+        print(runs.to_string(index=False) if not runs.empty else "Nenhuma execução de reanálise registrada.")
+        return
+
+    if args.retomar is not None:
+        run_id = args.retomar
+    else:
+        proposal_ids = select_proposals(
+            ids=args.ids, id_from=args.de_id, id_to=args.ate_id, status=args.status, clients=args.cliente,
+            proposal_types=args.tipo, date_from=args.desde, date_to=args.ate,
+        )
+        if not proposal_ids:
+            print("Nenhuma proposta atende aos filtros informados.")
+            return
+        if args.simular:
+            results = asyncio.run(dry_run(proposal_ids, workers=args.paralelo))
+            changed = 0
+            for proposal_id, changes in results.items():
+                if isinstance(changes, str):
+                    print(f"#{proposal_id}: não reanalisada ({changes})")
+                    continue
+                changed += bool(changes)
+                print(format_diff(proposal_id, changes))
+            print(f"\n{changed} de {len(results)} propostas seriam alteradas. Nada foi gravado.")
+            return
+        description = " ".join(f"{key}={value}" for key, value in vars(args).items()
+                               if value not in (None, False) and key not in ("paralelo", "simular"))
+        run_id = database.create_reanalysis_run(proposal_ids, description or "todas")
+        if run_id is None:
+            print("Não foi possível registrar a execução de reanálise.")
+            return
+        print(f"Execução {run_id} criada com {len(proposal_ids)} propostas.")
+
+    try:
+        counts = asyncio.run(run_reanalysis(run_id, workers=args.paralelo))
+    except KeyboardInterrupt:
+        print(f"\nInterrompida. Retome com: python -m src.core.reanalysis --retomar {run_id}")
+        return
+    if counts is None:
+        print(f"Não foi possível ler a execução {run_id}.")
+        return
+    print(f"Execução {run_id}: {counts['concluida']} concluídas, {counts['falhou']} com falha, "
+          f"{counts['sem_texto']} sem texto extraído.")
+    if counts['falhou']:
+        print(f"Para tentar de novo as que falharam: python -m src.core.reanalysis --retomar {run_id}")
+
+
+if __name__ == "__main__":
+    main()
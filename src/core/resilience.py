@@ -0,0 +1,293 @@
+import asyncio
+import heapq
+import os
+import random
+import re
+import threading
+import time
+import logging
+from . import logging_config
+
+logger = logging.getLogger(__name__)
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("AI_RETRY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.getenv("AI_RETRY_BASE_DELAY", "1.0"))
+RETRY_MAX_DELAY = float(os.getenv("AI_RETRY_MAX_DELAY", "60.0"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("AI_CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("AI_CIRCUIT_RESET_TIMEOUT", "60.0"))
+
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class TransientAIError(Exception):
+    """Falha temporária da IA (limite de taxa, indisponibilidade) que vale a pena tentar de novo mais tarde."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(TransientAIError):
+    """O circuito está aberto: a API foi considerada fora do ar e as chamadas estão suspensas."""
+
+
+def is_transient_error(exc):
+    """Indica se a exceção representa uma falha temporária (429, 5xx, timeout ou erro de conexão)."""
+    if isinstance(exc, TransientAIError):
+        return True
+    if isinstance(exc, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    code = getattr(exc, "code", None)
+    if isinstance(code, int) and code in TRANSIENT_STATUS_CODES:
+        return True
+    status_code = getattr(getattr(exc, "response", None), "status_code", None)
+    return status_code in TRANSIENT_STATUS_CODES
+
+
+def get_retry_after(exc):
+    """Extrai a sugestão de espera (em segundos) enviada pela API, se houver."""
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is not None:
+        return float(retry_after)
+
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    header = headers.get("Retry-After") if hasattr(headers, "get") else None
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            pass
+
+    # Erros gRPC do Gemini trazem um RetryInfo com "retry_delay { seconds: N }"
+    for detail in getattr(exc, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None and hasattr(delay, "seconds"):
+            return delay.seconds + getattr(delay, "nanos", 0) / 1e9
+    match = re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", str(exc))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+class RetryPolicy:
+    """Backoff exponencial com jitter completo, respeitando a sugestão de espera da API."""
+
+    def __init__(self, max_attempts=RETRY_MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def compute_delay(self, attempt, exc=None):
+        """Tempo de espera antes da tentativa seguinte (attempt começa em 0)."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        retry_after = get_retry_after(exc) if exc is not None else None
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Disjuntor para a API da IA. Depois de `failure_threshold` falhas temporárias seguidas o
+    circuito abre e as chamadas são recusadas até `reset_timeout` segundos; então uma chamada
+    de teste é liberada (meio-aberto) e, se funcionar, o circuito volta a fechar.
+    """
+
+    CLOSED = "fechado"
+    OPEN = "aberto"
+    HALF_OPEN = "meio-aberto"
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT, name="gemini"):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._open_for = reset_timeout
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self._open_for:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def seconds_until_retry(self):
+        """Segundos até o circuito aceitar chamadas novamente (0 se já aceita)."""
+        with self._lock:
+            if self._current_state() != self.OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self._open_for - time.monotonic())
+
+    def allow_request(self):
+        """Indica se uma chamada pode ser feita agora."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuito '{self.name}' fechado: a API voltou a responder.")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Libera a chamada de teste cujo resultado ficou desconhecido (ex.: cancelada), permitindo outra."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self, retry_after=None):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._open_for = max(self.reset_timeout, retry_after or 0.0)
+                self._probe_in_flight = False
+                logger.warning(
+                    f"Circuito '{self.name}' aberto após {self._failures} falha(s) temporária(s). "
+                    f"Chamadas suspensas por {self._open_for:.0f}s."
+                )
+
+    def wait_until_available(self):
+        """Bloqueia enquanto o circuito estiver aberto (pausa o pipeline em vez de falhar os arquivos)."""
+        wait = self.seconds_until_retry()
+        if wait > 0:
+            logger.warning(f"API da IA indisponível. Pipeline pausado por {wait:.0f}s.")
+            time.sleep(wait)
+
+
+def _before_call(breaker):
+    if breaker and not breaker.allow_request():
+        raise CircuitOpenError(
+            f"Circuito '{breaker.name}' aberto; chamada suspensa.", retry_after=breaker.seconds_until_retry()
+        )
+
+
+def _after_failure(exc, attempt, policy, breaker):
+    """Registra a falha e retorna a espera antes da próxima tentativa (ou relança a exceção)."""
+    if not is_transient_error(exc):
+        # Um erro definitivo (ex.: resposta inválida) mostra que a API está respondendo
+        if breaker:
+            breaker.record_success()
+        raise exc
+    retry_after = get_retry_after(exc)
+    if breaker:
+        breaker.record_failure(retry_after)
+    if attempt + 1 >= policy.max_attempts:
+        raise TransientAIError(f"Falha temporária após {policy.max_attempts} tentativa(s): {exc}", retry_after) from exc
+    delay = policy.compute_delay(attempt, exc)
+    logger.warning(f"Falha temporária na IA ({exc}). Nova tentativa em {delay:.1f}s ({attempt + 1}/{policy.max_attempts}).")
+    return delay
+
+
+def call_with_retry(func, *args, policy=None, breaker=None, **kwargs):
+    """Executa `func` com novas tentativas para falhas temporárias, respeitando o disjuntor."""
+    policy = policy or RetryPolicy()
+    for attempt in range(policy.max_attempts):
+        _before_call(breaker)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as exc:
+            time.sleep(_after_failure(exc, attempt, policy, breaker))
+            continue
+        except BaseException:
+            # Cancelamento ou interrupção: o resultado da chamada é desconhecido
+            if breaker:
+                breaker.release_probe()
+            raise
+        if breaker:
+            breaker.record_success()
+        return result
+
+
+async def call_with_retry_async(func, *args, policy=None, breaker=None, **kwargs):
+    """Versão assíncrona de `call_with_retry` para corrotinas."""
+    policy = policy or RetryPolicy()
+    for attempt in range(policy.max_attempts):
+        _before_call(breaker)
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as exc:
+            await asyncio.sleep(_after_failure(exc, attempt, policy, breaker))
+            continue
+        except BaseException:
+            # Cancelamento ou interrupção: o resultado da chamada é desconhecido
+            if breaker:
+                breaker.release_probe()
+            raise
+        if breaker:
+            breaker.record_success()
+        return result
+
+
+class RetryQueue:
+    """Fila de arquivos que falharam por erro temporário, com o momento da próxima tentativa."""
+
+    def __init__(self, max_attempts=5, policy=None):
+        self.max_attempts = max_attempts
+        self.policy = policy or RetryPolicy(base_delay=30.0, max_delay=900.0)
+        self._heap = []
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, item, retry_after=None):
+        """
+        Agenda uma nova tentativa para o item. Retorna False se o limite de tentativas
+        foi atingido (o item deve então ser tratado como erro definitivo).
+        """
+        with self._lock:
+            attempts = self._attempts.get(item, 0)
+            if attempts >= self.max_attempts:
+                self._attempts.pop(item, None)
+                return False
+            self._attempts[item] = attempts + 1
+            delay = self.policy.compute_delay(attempts)
+            if retry_after:
+                delay = max(delay, retry_after)
+            heapq.heappush(self._heap, (time.monotonic() + delay, id(item), item))
+        logger.info(f"Nova tentativa de '{item}' agendada em {delay:.0f}s (tentativa {attempts + 1}/{self.max_attempts}).")
+        return True
+
+    def forget(self, item):
+        """Descarta o histórico de tentativas de um item concluído."""
+        with self._lock:
+            self._attempts.pop(item, None)
+
+    def pop_due(self):
+        """Retorna os itens cuja próxima tentativa já venceu."""
+        due = []
+        now = time.monotonic()
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[2])
+        return due
+
+    def seconds_until_next(self):
+        """Segundos até o próximo item vencer, ou None se a fila estiver vazia."""
+        with self._lock:
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._heap)
+
+
+# Disjuntor compartilhado por todas as chamadas ao Gemini no processo
+gemini_breaker = CircuitBreaker()
@@ -0,0 +1,110 @@
+import os
+import re
+import logging
+from . import logging_config
+
+logger = logging.getLogger(__name__)
+
+# Proporção aproximada de caracteres por token usada nas estimativas
+CHARS_PER_TOKEN = 4
+
+# Orçamento (em tokens estimados) do texto da proposta enviado à IA (0 = sem redução)
+LLM_INPUT_TOKEN_BUDGET = int(os.getenv("LLM_INPUT_TOKEN_BUDGET", "6000"))
+# Tamanho máximo de cada seção antes de ser dividida
+MAX_SECTION_CHARS = int(os.getenv("TEXT_REDUCER_MAX_SECTION_CHARS", "1200"))
+
+# Padrões que indicam os campos que a análise precisa, com o peso de cada um
+FIELD_PATTERNS = [
+    (re.compile(r"R\$\s*\d[\d\.]*(?:,\d{2})?"), 3.0),
+    (re.compile(r"valor\s+(?:total|global)|total\s+geral|investimento|pre[çc]o", re.IGNORECASE), 4.0),
+    (re.compile(r"prazo|cronograma|entrega|dias\s+(?:úteis|uteis|corridos)|\d+\s+dias", re.IGNORECASE), 2.0),
+    (re.compile(r"pagamento|parcela|faturamento|vencimento|boleto|à\s+vista|a\s+vista", re.IGNORECASE), 2.0),
+    (re.compile(r"cliente|contratante|raz[ãa]o\s+social|cnpj|prezad[oa]s?|\bA/C\b", re.IGNORECASE), 2.5),
+    (re.compile(r"objeto|escopo|produto|servi[çc]o|solu[çc][ãa]o", re.IGNORECASE), 1.5),
+    (re.compile(r"validade", re.IGNORECASE), 1.0),
+]
+# Cada padrão conta no máximo esta quantidade de ocorrências por seção
+MAX_MATCHES_PER_PATTERN = 3
+# Bônus para o início do documento, onde costumam estar o cliente e o objeto
+HEADER_BONUS = 3.0
+
+
+def estimate_tokens(text):
+    """Estimativa simples do número de tokens de um texto (~4 caracteres por token)."""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def split_sections(text, max_section_chars=MAX_SECTION_CHARS):
+    """Divide o texto em seções por parágrafos, quebrando os longos em blocos de linhas."""
+    sections = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_section_chars:
+            sections.append(paragraph)
+            continue
+        current = []
+        size = 0
+        for line in paragraph.splitlines():
+            if current and size + len(line) > max_section_chars:
+                sections.append("\n".join(current))
+                current, size = [], 0
+            current.append(line)
+            size += len(line) + 1
+        if current:
+            sections.append("\n".join(current))
+    return sections
+
+
+def score_section(section, index):
+    """Pontua uma seção pela presença dos campos buscados (valores, prazos, pagamento, cliente)."""
+    score = HEADER_BONUS if index == 0 else 0.0
+    for pattern, weight in FIELD_PATTERNS:
+        matches = len(pattern.findall(section))
+        score += weight * min(matches, MAX_MATCHES_PER_PATTERN)
+    return score
+
+
+def reduce_text(text, token_budget=None):
+    """
+    Mantém apenas as seções mais relevantes do texto dentro do orçamento de tokens,
+    preservando a ordem original. Textos que já cabem no orçamento são devolvidos intactos.
+    """
+    token_budget = LLM_INPUT_TOKEN_BUDGET if token_budget is None else token_budget
+    original_tokens = estimate_tokens(text)
+    if not token_budget or original_tokens <= token_budget:
+        return text
+
+    sections = split_sections(text)
+    ranked = sorted(
+        ((score_section(section, index), index, section) for index, section in enumerate(sections)),
+        key=lambda item: (-item[0], item[1]),
+    )
+
+    selected = []
+    remaining = token_budget
+    for score, index, section in ranked:
+        if score <= 0:
+            break
+        tokens = estimate_tokens(section)
+        if tokens <= remaining:
+            selected.append(index)
+            remaining -= tokens
+
+    parts = []
+    previous = None
+    for index in sorted(selected):
+        if previous is not None and index != previous + 1:
+            parts.append("[...]")
+        parts.append(sections[index])
+        previous = index
+    reduced = "\n\n".join(parts)
+
+    reduced_tokens = estimate_tokens(reduced) if reduced else 0
+    logger.info(
+        f"Texto reduzido de {original_tokens} para {reduced_tokens} tokens estimados "
+        f"({len(selected)}/{len(sections)} seções; compressão de {original_tokens / max(reduced_tokens, 1):.1f}x)."
+    )
+    # Nenhuma seção relevante coube no orçamento: envia o início do documento
+    return reduced or text[:token_budget * CHARS_PER_TOKEN]
@@ -1,14 +1,21 @@
 import os
+import queue
 import shutil
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import logging
 from src.core import logging_config
 
 from src.core import database_service as database
+from src.core import inbox_watcher
 from src.core import pdf_extractor
 from src.core import proposal_processor as analysis_processor
-from src.core import notification_service as notifier
+from src.core import notification_dispatcher
+from src.core import resilience
+from src.core import metrics
+from src.core.resilience import TransientAIError
 
 logger = logging.getLogger(__name__)
 
@@ -16,75 +23,310 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 INPUT_DIR = BASE_DIR / "propostas_a_processar"
 PROCESSED_DIR = BASE_DIR / "propostas_processadas"
 POLL_INTERVAL = 10
+# Modo de observação da pasta: "auto" (inotify com fallback), "inotify" ou "polling"
+WATCH_MODE = os.getenv("WATCH_MODE", "auto").lower()
+
+# Modo do pipeline: "sequencial" (um arquivo por vez) ou "concorrente" (pools por etapa)
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "sequencial").lower()
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+NOTIFICATION_WORKERS = int(os.getenv("NOTIFICATION_WORKERS", "2"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+# Quantas vezes um arquivo que falhou por erro temporário da IA é tentado de novo antes de ir para 'com_erro'
+FILE_RETRY_MAX_ATTEMPTS = int(os.getenv("FILE_RETRY_MAX_ATTEMPTS", "5"))
+
+retry_queue = resilience.RetryQueue(max_attempts=FILE_RETRY_MAX_ATTEMPTS)
+
+_STOP = object()  # Sentinela para encerrar as threads de cada etapa
+
+def check_duplicate(pdf_path):
+    """
+    Calcula o hash do conteúdo do PDF e procura uma proposta já registrada com o mesmo conteúdo.
+    Retorna (hash, proposta existente ou None).
+    """
+    content_hash = database.compute_content_hash(pdf_path)
+    return content_hash, database.get_proposal_by_hash(content_hash)
+
+def finish_duplicate(pdf_path, existing):
+    """Finaliza um arquivo duplicado sem reprocessá-lo, reaproveitando o registro existente."""
+    logger.info(
+        f"Proposta {pdf_path.name} já processada anteriormente (ID {existing['id']}, "
+        f"arquivo original '{existing.get('nome_arquivo')}'). Extração e IA ignoradas."
+    )
+    move_file_to_processed(pdf_path, success=True, outcome="duplicada")
+    retry_queue.forget(pdf_path)
+
+def extract_stage(pdf_path, extractor=None):
+    """Etapa 1: extrai o texto do PDF. Retorna None se o texto for inválido."""
+    logger.info("1. Extraindo texto do PDF...")
+    with metrics.timed("extracao"):
+        text = extractor(str(pdf_path)) if extractor else pdf_extractor.extract_text_from_pdf(pdf_path)
+    if not text or len(text) < 50:
+        logger.warning(f"Falha: Texto não extraído ou muito curto em {pdf_path.name}.")
+        metrics.stage_failures.inc(stage="extracao")
+        return None
+    return text
+
+def analysis_stage(pdf_path, text, content_hash=None):
+    """
+    Etapa 2: chama a IA para extrair os dados e gerar o resumo, e salva no banco.
+    Se a API estiver fora do ar (circuito aberto), aguarda antes de chamar a IA.
+    """
+    resilience.gemini_breaker.wait_until_available()
+    logger.info("2. Analisando para extrair dados e gerar resumo...")
+    with metrics.timed("analise"):
+        structured_data = analysis_processor.analyze_proposal(text, include_prediction=False)
+    if not structured_data:
+        logger.warning(f"Falha: Não foi possível extrair dados estruturados de {pdf_path.name}.")
+        metrics.stage_failures.inc(stage="analise")
+        return None
+
+    structured_data['nome_arquivo'] = pdf_path.name
+    structured_data['content_hash'] = content_hash
+    logger.info(f"Dados extraídos: Cliente: {structured_data.get('nome_cliente')}, Valor: {structured_data.get('valor_proposta')}")
+    logger.info("3. Resumo gerado com sucesso.")
+
+    logger.info("4. Salvando no banco de dados...")
+    with metrics.timed("banco"):
+        structured_data['id'] = database.insert_proposal(structured_data, extracted_text=text)
+    return structured_data
+
+def notification_stage(pdf_path, structured_data):
+    """
+    Etapa 3: enfileira a notificação e move o arquivo para a pasta de processados.
+    O envio ao WhatsApp é feito em segundo plano pelo notification_dispatcher.
+    """
+    logger.info("5. Enfileirando notificação...")
+    with metrics.timed("notificacao"):
+        notification_dispatcher.enqueue_notification(structured_data)
+    move_file_to_processed(pdf_path, success=True)
+    retry_queue.forget(pdf_path)
+    logger.info(f"--- Processamento de {pdf_path.name} concluído com sucesso! ---")
+
+def handle_transient_failure(pdf_path, error):
+    """Agenda uma nova tentativa do arquivo ou, se as tentativas acabaram, move-o para 'com_erro'."""
+    logger.warning(f"Falha temporária da IA ao processar {pdf_path.name}: {error}")
+    if retry_queue.schedule(pdf_path, retry_after=error.retry_after):
+        metrics.files_processed.inc(resultado="nova_tentativa")
+    else:
+        logger.error(f"Tentativas esgotadas para {pdf_path.name}.")
+        move_file_to_processed(pdf_path, success=False)
+
+def process_file(pdf_path):
+    """Processa um único arquivo, de forma sequencial, passando por todas as etapas."""
+    logger.info(f"--- Nova proposta encontrada: {pdf_path.name} ---")
+    try:
+        content_hash, existing = check_duplicate(pdf_path)
+        if existing:
+            finish_duplicate(pdf_path, existing)
+            return
+
+        text = extract_stage(pdf_path)
+        if not text:
+            move_file_to_processed(pdf_path, success=False)
+            return
+
+        structured_data = analysis_stage(pdf_path, text, content_hash)
+        if not structured_data:
+            move_file_to_processed(pdf_path, success=False)
+            return
+
+        notification_stage(pdf_path, structured_data)
+    except TransientAIError as e:
+        handle_transient_failure(pdf_path, e)
+    except Exception as e:
+        logger.error(f"Erro inesperado ao processar {pdf_path.name}.", exc_info=True)
+        move_file_to_processed(pdf_path, success=False)
+
+class ConcurrentPipeline:
+    """
+    Pipeline concorrente: a extração roda em um pool de processos e as etapas de IA
+    e de notificação em threads, ligadas por filas limitadas para manter a memória estável.
+    """
+
+    def __init__(self, extraction_workers=EXTRACTION_WORKERS, analysis_workers=ANALYSIS_WORKERS,
+                 notification_workers=NOTIFICATION_WORKERS, queue_size=PIPELINE_QUEUE_SIZE):
+        self.extraction_workers = max(1, extraction_workers)
+        self.analysis_workers = max(1, analysis_workers)
+        self.notification_workers = max(1, notification_workers)
+        self.extraction_queue = queue.Queue(maxsize=queue_size)
+        self.analysis_queue = queue.Queue(maxsize=queue_size)
+        self.notification_queue = queue.Queue(maxsize=queue_size)
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._process_pool = None
+
+    def start(self):
+        """Inicia o pool de processos e as threads de cada etapa."""
+        self._process_pool = ProcessPoolExecutor(max_workers=self.extraction_workers)
+        stages = [
+            (self._extraction_worker, self.extraction_workers, "extracao"),
+            (self._analysis_worker, self.analysis_workers, "analise"),
+            (self._notification_worker, self.notification_workers, "notificacao"),
+        ]
+        for target, count, name in stages:
+            for i in range(count):
+                thread = threading.Thread(target=target, name=f"pipeline-{name}-{i}", daemon=True)
+                thread.start()
+                self._threads.append((name, thread))
+        logger.info(
+            f"Pipeline concorrente iniciado (extração: {self.extraction_workers}, "
+            f"análise: {self.analysis_workers}, notificação: {self.notification_workers})."
+        )
+
+    def submit(self, pdf_path):
+        """
+        Enfileira um arquivo para processamento. Bloqueia se a fila estiver cheia.
+        Retorna False se o arquivo já estiver em processamento.
+        """
+        with self._lock:
+            if pdf_path in self._in_flight:
+                return False
+            self._in_flight.add(pdf_path)
+        logger.info(f"--- Nova proposta encontrada: {pdf_path.name} ---")
+        self.extraction_queue.put(pdf_path)
+        return True
+
+    def is_idle(self):
+        """Indica se não há nenhum arquivo em processamento."""
+        with self._lock:
+            return not self._in_flight
+
+    def shutdown(self):
+        """Aguarda o esvaziamento das filas e encerra as etapas em ordem."""
+        for name, stage_queue, count in [
+            ("extracao", self.extraction_queue, self.extraction_workers),
+            ("analise", self.analysis_queue, self.analysis_workers),
+            ("notificacao", self.notification_queue, self.notification_workers),
+        ]:
+            for _ in range(count):
+                stage_queue.put(_STOP)
+            for thread_name, thread in self._threads:
+                if thread_name == name:
+                    thread.join()
+        if self._process_pool:
+            self._process_pool.shutdown()
+        logger.info("Pipeline concorrente encerrado.")
+
+    def _finish(self, pdf_path, success, transient_error=None):
+        if transient_error is not None:
+            handle_transient_failure(pdf_path, transient_error)
+        elif not success:
+            move_file_to_processed(pdf_path, success=False)
+        with self._lock:
+            self._in_flight.discard(pdf_path)
+
+    def _extraction_worker(self):
+        while True:
+            pdf_path = self.extraction_queue.get()
+            if pdf_path is _STOP:
+                return
+            try:
+                content_hash, existing = check_duplicate(pdf_path)
+                if existing:
+                    finish_duplicate(pdf_path, existing)
+                    self._finish(pdf_path, success=True)
+                    continue
+                text = extract_stage(
+                    pdf_path,
+                    extractor=lambda path: self._process_pool.submit(pdf_extractor.extract_text_from_pdf, path).result(),
+                )
+                if not text:
+                    self._finish(pdf_path, success=False)
+                    continue
+                self.analysis_queue.put((pdf_path, text, content_hash))
+            except Exception:
+                logger.error(f"Erro inesperado ao extrair {pdf_path.name}.", exc_info=True)
+                self._finish(pdf_path, success=False)
+
+    def _analysis_worker(self):
+        while True:
+            item = self.analysis_queue.get()
+            if item is _STOP:
+                return
+            pdf_path, text, content_hash = item
+            try:
+                structured_data = analysis_stage(pdf_path, text, content_hash)
+                if not structured_data:
+                    self._finish(pdf_path, success=False)
+                    continue
+                self.notification_queue.put((pdf_path, structured_data))
+            except TransientAIError as e:
+                self._finish(pdf_path, success=False, transient_error=e)
+            except Exception:
+                logger.error(f"Erro inesperado ao analisar {pdf_path.name}.", exc_info=True)
+                self._finish(pdf_path, success=False)
+
+    def _notification_worker(self):
+        while True:
+            item = self.notification_queue.get()
+            if item is _STOP:
+                return
+            pdf_path, structured_data = item
+            try:
+                notification_stage(pdf_path, structured_data)
+                self._finish(pdf_path, success=True)
+            except Exception:
+                logger.error(f"Erro inesperado ao notificar {pdf_path.name}.", exc_info=True)
+                self._finish(pdf_path, success=False)
 
 def main():
     """Função principal que orquestra o pipeline de processamento de propostas."""
     logger.info("Iniciando o serviço de monitoramento de propostas...")
-    
+
     database.setup_database()
     INPUT_DIR.mkdir(exist_ok=True)
     PROCESSED_DIR.mkdir(exist_ok=True)
 
-    logger.info(f"Monitorando a pasta: '{INPUT_DIR.resolve()}'")
+    logger.info(f"Monitorando a pasta: '{INPUT_DIR.resolve()}' (modo: {PIPELINE_MODE})")
+
+    # Porta do exportador de métricas no formato Prometheus (METRICS_PORT=0 desativa)
+    if metrics.METRICS_PORT:
+        metrics.start_metrics_server(metrics.METRICS_PORT)
+
+    # Inicia o envio das notificações (inclusive as que ficaram na fila da execução anterior)
+    dispatcher = notification_dispatcher.get_dispatcher()
+
+    pipeline = None
+    if PIPELINE_MODE == "concorrente":
+        pipeline = ConcurrentPipeline()
+        pipeline.start()
+
+    watcher = inbox_watcher.create_watcher(INPUT_DIR, mode=WATCH_MODE, poll_interval=POLL_INTERVAL)
 
     while True:
         try:
-            files_to_process = list(INPUT_DIR.glob("*.pdf"))
-            
-            if not files_to_process:
-                time.sleep(POLL_INTERVAL)
-                continue
+            # Bloqueia até que existam PDFs completos (que pararam de crescer) na pasta
+            # ou até vencer a próxima nova tentativa agendada
+            files_to_process = watcher.wait_for_files(timeout=retry_queue.seconds_until_next())
+            files_to_process += [pdf_path for pdf_path in retry_queue.pop_due() if pdf_path.exists()]
 
             for pdf_path in files_to_process:
-                logger.info(f"--- Nova proposta encontrada: {pdf_path.name} ---")
-                
-                try:
-                    logger.info("1. Extraindo texto do PDF...")
-                    text = pdf_extractor.extract_text_from_pdf(pdf_path)
-                    if not text or len(text) < 50:
-                        logger.warning("Falha: Texto não extraído ou muito curto. Pulando arquivo.")
-                        move_file_to_processed(pdf_path, success=False)
-                        continue
-
-                    logger.info("2. Analisando para extrair dados...")
-                    structured_data = analysis_processor.extract_structured_data(text)
-                    if not structured_data:
-                        logger.warning("Falha: Não foi possível extrair dados estruturados. Pulando arquivo.")
-                        move_file_to_processed(pdf_path, success=False)
-                        continue
-                    
-                    structured_data['nome_arquivo'] = pdf_path.name
-                    logger.info(f"Dados extraídos: Cliente: {structured_data.get('nome_cliente')}, Valor: {structured_data.get('valor_proposta')}")
-
-                    logger.info("3. Gerando resumo automático...")
-                    summary = analysis_processor.generate_summary(structured_data)
-                    structured_data['resumo_ia'] = summary
-                    logger.info("Resumo gerado com sucesso.")
-
-                    logger.info("4. Salvando no banco de dados...")
-                    database.insert_proposal(structured_data)
-
-                    logger.info("5. Enviando notificação...")
-                    notifier.send_notification(structured_data)
-
-                    move_file_to_processed(pdf_path, success=True)
-                    logger.info(f"--- Processamento de {pdf_path.name} concluído com sucesso! ---")
-
-                except Exception as e:
-                    logger.error(f"Erro inesperado ao processar {pdf_path.name}.", exc_info=True)
-                    move_file_to_processed(pdf_path, success=False)
-            
-            logger.info(f"Ciclo concluído. Aguardando novos arquivos...")
+                if pipeline:
+                    pipeline.submit(pdf_path)
+                else:
+                    process_file(pdf_path)
+
+            if not pipeline:
+                logger.info(f"Ciclo concluído. Aguardando novos arquivos...")
 
         except KeyboardInterrupt:
             logger.info("Serviço de monitoramento interrompido pelo usuário.")
+            watcher.close()
+            if pipeline:
+                pipeline.shutdown()
+            dispatcher.stop()
             break
         except Exception as e:
             logger.critical("Um erro crítico ocorreu no loop principal do monitor.", exc_info=True)
             time.sleep(POLL_INTERVAL * 2) # Espera um pouco mais antes de tentar de novo
 
-def move_file_to_processed(file_path, success=True):
-    """Move o arquivo para a pasta de processados ou de erro."""
+def move_file_to_processed(file_path, success=True, outcome=None):
+    """
+    Move o arquivo para a pasta de processados ou de erro e conta o resultado nas métricas
+    (`outcome`, ou "sucesso"/"erro" conforme `success`). Cada arquivo é contado uma única vez.
+    """
     try:
         if success:
             destination = PROCESSED_DIR / file_path.name
@@ -92,9 +334,10 @@ def move_file_to_processed(file_path, success=True):
             error_dir = PROCESSED_DIR / "com_erro"
             error_dir.mkdir(exist_ok=True)
             destination = error_dir / file_path.name
-            
+
         shutil.move(file_path, destination)
         status = "sucesso" if success else "erro"
+        metrics.files_processed.inc(resultado=outcome or status)
         logger.info(f"Arquivo movido para a pasta de processados ({status}).")
     except Exception as e:
         logger.error(f"Falha ao mover o arquivo {file_path.name}", exc_info=True)
@@ -12,14 +12,20 @@ import pandas as pd
 
 from src.core import database_service as database
 from src.core import proposal_processor as analysis_processor
+from streamlit_app import dashboard_cache
 
 database.setup_database()
 
 DB_PATH = "src/app/data/propostas.db"
 
-def get_all_proposals():
-    """Busca todas as propostas do banco de dados e retorna como um DataFrame."""
-    return database.get_all_proposals_as_dataframe()
+PAGE_SIZE = 50
+SEARCH_LIMIT = 20
+# Colunas usadas no resumo das pendentes (updated_at identifica quando o resumo precisa ser refeito)
+PENDING_COLUMNS = ['id', 'nome_cliente', 'valor_proposta', 'produto_servico', 'status', 'updated_at']
+
+def get_proposals_page(page, page_size=PAGE_SIZE):
+    """Busca uma página do histórico de propostas (apenas as colunas da listagem)."""
+    return dashboard_cache.query_proposals(limit=page_size, offset=(page - 1) * page_size)
 
 
 # --- Configuração da Página Streamlit ---
@@ -66,18 +72,33 @@ st.markdown("Visualize propostas processadas ou envie um novo PDF para análise.
 
 # --- Aviso de Propostas Pendentes (IA) ---
 st.subheader("Status das Propostas Pendentes")
-pending_proposals_df = database.get_all_proposals_as_dataframe()
-pending_proposals_df = pending_proposals_df[pending_proposals_df['status'] == 'pendente']
-
-if not pending_proposals_df.empty:
-    st.warning(f"Você tem {len(pending_proposals_df)} proposta(s) pendente(s) de análise!")
+pending_df = dashboard_cache.query_proposals(status='pendente', columns=PENDING_COLUMNS)
+
+if not pending_df.empty:
+    st.warning(f"Você tem {len(pending_df)} proposta(s) pendente(s) de análise!")
+    # O resumo da IA só é gerado a pedido; um resumo já gerado para o mesmo conjunto de
+    # pendentes é mostrado direto do cache, sem nova chamada
+    pending_key = analysis_processor.pending_digest_key(pending_df)
+    summary = analysis_processor.get_cached_pending_summary(pending_df)
+    if summary is not None:
+        st.info(summary)
+    else:
+        if st.session_state.get('pending_summary_key') == pending_key:
+            # Falha da última tentativa: fica na tela até o usuário pedir de novo
+            st.info(st.session_state.pending_summary)
+        if st.button("Gerar resumo com IA", key="pending_summary_button"):
+            with st.spinner("Gerando resumo das propostas pendentes..."):
+                summary = analysis_processor.summarize_pending_proposals(pending_df)
+            st.session_state.pending_summary_key = pending_key
+            st.session_state.pending_summary = summary
+            st.rerun()
 else:
     st.success("🎉 Nenhuma proposta pendente no momento. Tudo em dia!")
 
 st.markdown("---")
 
 # --- Seções com Abas ---
-tab1 = st.tabs(["Histórico de Propostas"])
+tab1 = st.tabs(["Histórico de Propostas", "Buscar Propostas"])
 
 with tab1[0]:
     st.header("Histórico de Propostas Processadas")
@@ -86,18 +107,22 @@ with tab1[0]:
     if st.button("Atualizar Lista de Propostas", key="refresh_home_proposals"):
         st.rerun()
 
-    proposals_df = get_all_proposals()
+    total_proposals = dashboard_cache.count_proposals()
 
-    if proposals_df.empty:
+    if not total_proposals:
         st.info("Nenhuma proposta processada ainda. Envie um arquivo na aba 'Processar Nova Proposta' para começar.")
     else:
+        total_pages = -(-total_proposals // PAGE_SIZE)
+        page = st.number_input("Página", min_value=1, max_value=total_pages, step=1, key="home_page")
+        proposals_df = get_proposals_page(page)
         st.dataframe(proposals_df, use_container_width=True)
+        st.caption(f"Página {page} de {total_pages} ({total_proposals} propostas).")
 
         st.subheader("Detalhes da Proposta Selecionada")
         selected_id = st.selectbox("Selecione o ID da Proposta para ver detalhes", options=proposals_df['id'].unique(), key="home_details_selector")
 
         if selected_id:
-            details = database.get_proposal_details(selected_id)
+            details = dashboard_cache.get_proposal_details(selected_id)
             if details:
                 st.markdown(f"#### Resumo da Proposta: **{details['nome_cliente']}**")
                 
@@ -114,8 +139,31 @@ with tab1[0]:
 
                 with st.expander("Ver todos os dados extraídos (JSON)"):
                     st.json(details)
+
+                # O texto do PDF é grande: só é lido (e descomprimido) quando pedido
+                if st.checkbox("Mostrar texto extraído do PDF", key="home_show_text"):
+                    extracted_text = (database.get_proposal_details(selected_id, include_text=True) or {}).get('texto_extraido')
+                    if extracted_text:
+                        st.text_area("Texto extraído", extracted_text, height=300, disabled=True)
+                    else:
+                        st.info("O texto extraído desta proposta não está guardado.")
             else:
                 st.warning("Não foi possível encontrar os detalhes para o ID selecionado.")
 
-# Inicializa o banco de dados na primeira execução
-database.setup_database()
+with tab1[1]:
+    st.header("Buscar Propostas por Conteúdo")
+    st.markdown("Busca no cliente, produto/serviço, condições, resumo da IA e texto extraído do PDF. Use aspas para buscar uma frase exata.")
+
+    search_query = st.text_input("Termos da busca", placeholder='ex.: suporte premium, "30 dias"', key="home_search_query")
+    if search_query:
+        results = dashboard_cache.search_proposals(search_query, limit=SEARCH_LIMIT)
+        if results.empty:
+            st.info("Nenhuma proposta encontrada para essa busca.")
+        else:
+            st.caption(f"{len(results)} resultado(s), do mais relevante para o menos relevante.")
+            for row in results.itertuples():
+                valor = f"R$ {row.valor_proposta:,.2f}" if pd.notna(row.valor_proposta) else "valor não informado"
+                st.markdown(f"**#{row.id} – {row.nome_cliente}** · {row.status} · {valor}")
+                # Quebras de linha e cifrões ($ ativa fórmulas no markdown) são ajustados para exibição
+                trecho = " ".join((row.trecho or "").split()).replace("$", "\\$")
+                st.markdown(f"> {trecho}")
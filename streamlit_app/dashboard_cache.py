@@ -0,0 +1,93 @@
+import os
+
+import streamlit as st
+
+from src.core import database_service as database
+
+# Quantidade máxima de resultados guardados (versões antigas são descartadas primeiro)
+DASHBOARD_CACHE_MAX_ENTRIES = int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", "512"))
+
+
+@st.cache_data(show_spinner=False, max_entries=DASHBOARD_CACHE_MAX_ENTRIES)
+def _cached_call(function_name, data_version, args, kwargs):
+    # Erros são relançados: o cache não guarda exceções, só resultados de consultas bem-sucedidas
+    with database.raise_query_errors():
+        return getattr(database, function_name)(*args, **kwargs)
+
+
+def _cached(function_name):
+    """
+    Envolve uma consulta do database_service em um cache compartilhado entre as sessões,
+    indexado pela versão dos dados: enquanto nada muda no banco, as execuções das páginas
+    usam o resultado guardado; após qualquer alteração, a consulta é refeita.
+    """
+    function = getattr(database, function_name)
+
+    def wrapper(*args, **kwargs):
+        version = database.get_data_version()
+        if version is None:
+            # Sem a versão não há como saber se o cache está atualizado
+            return function(*args, **kwargs)
+        try:
+            return _cached_call(function_name, version, args, kwargs)
+        except Exception:
+            # Falha passageira (ex.: banco travado): resultado sem cache, que a próxima execução refaz
+            return function(*args, **kwargs)
+
+    wrapper.__name__ = function_name
+    wrapper.__doc__ = function.__doc__
+    return wrapper
+
+
+query_proposals = _cached("query_proposals")
+count_proposals = _cached("count_proposals")
+aggregate_proposals = _cached("aggregate_proposals")
+get_proposal_kpis = _cached("get_proposal_kpis")
+get_distinct_values = _cached("get_distinct_values")
+get_proposal_details = _cached("get_proposal_details")
+search_proposals = _cached("search_proposals")
+
+
+def _still_on_page(page_df, changes, filters):
+    """Indica se as alterações podem ser aplicadas à página sem reconsultá-la."""
+    if filters.get("date_from") or filters.get("date_to"):
+        return False
+    # Propostas novas mudam a composição das páginas
+    if not changes["id"].isin(page_df["id"]).all():
+        return False
+    # Uma proposta alterada que deixou de atender aos filtros sai da página
+    for column, key in (("status", "status"), ("nome_cliente", "clients"), ("proposal_type", "proposal_types")):
+        values = filters.get(key)
+        if values is None:
+            continue
+        values = [values] if isinstance(values, str) else list(values)
+        if not changes[column].isin(values).all():
+            return False
+    return True
+
+
+def load_page(state_key, filters, limit, offset):
+    """
+    Carrega uma página de propostas e a mantém em session_state. Nas execuções seguintes
+    com a mesma consulta, aplica apenas as propostas alteradas desde a última leitura
+    (upsert pelo id); se a página mudou de composição, ela é consultada de novo.
+    """
+    query = {"filters": filters, "limit": limit, "offset": offset}
+    state = st.session_state.get(state_key)
+    version = database.get_data_version()
+    if state and state["query"] == query and version is not None:
+        if version == state["version"]:
+            return state["df"]
+        changes, watermark = database.get_proposals_changed_since(state["watermark"], columns=database.LIST_COLUMNS)
+        if changes is not None and not changes.empty and _still_on_page(state["df"], changes, filters):
+            page = state["df"].set_index("id")
+            delta = changes.drop(columns="updated_at").drop_duplicates("id", keep="last").set_index("id")
+            page.loc[delta.index, delta.columns] = delta
+            state.update(df=page.reset_index(), watermark=watermark, version=version)
+            return state["df"]
+
+    # A marca d'água é lida antes da consulta para não perder alterações feitas durante ela
+    watermark = database.get_change_watermark()
+    df = database.query_proposals(**filters, limit=limit, offset=offset)
+    st.session_state[state_key] = {"query": query, "df": df, "watermark": watermark, "version": version}
+    return df
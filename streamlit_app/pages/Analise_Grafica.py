@@ -9,7 +9,10 @@ if project_root not in sys.path:
 import streamlit as st
 
 import pandas as pd
-from src.core.database_service import get_all_proposals_as_dataframe, update_proposal_status, get_proposal_details, update_proposal_details
+from src.core.database_service import update_proposal_status, update_proposal_details
+from streamlit_app.dashboard_cache import (
+    load_page, aggregate_proposals, get_proposal_kpis, get_distinct_values, get_proposal_details,
+)
 import plotly.express as px
 
 # --- Configuração da Página ---
@@ -19,42 +22,51 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- Funções de Callback ---
-def refresh_data():
-    """Recarrega os dados da sessão."""
-    st.session_state.df_propostas = get_all_proposals_as_dataframe()
-
-# --- Carregamento dos Dados ---
-if 'df_propostas' not in st.session_state:
-    st.session_state.df_propostas = get_all_proposals_as_dataframe()
-
-df = st.session_state.df_propostas
+PAGE_SIZES = [25, 50, 100, 200]
+# Quantidade de clientes exibidos no gráfico de valor por cliente
+TOP_CLIENTS = 20
 
 # --- Título e Atualização ---
 st.title("Análise Gráfica de Propostas")
-st.button("Atualizar Dados", on_click=refresh_data)
+st.button("Atualizar Dados") # Os dados são consultados no banco a cada execução da página
 
 # --- Sidebar de Filtros ---
 st.sidebar.header("Filtros")
+status_options = get_distinct_values("status")
 status_filter = st.sidebar.multiselect(
     "Filtrar por Status",
-    options=df["status"].unique(),
-    default=df["status"].unique()
+    options=status_options,
+    default=status_options
 )
 
 client_filter = st.sidebar.multiselect(
     "Filtrar por Cliente",
-    options=df["nome_cliente"].unique(),
-    default=df["nome_cliente"].unique()
+    options=get_distinct_values("nome_cliente"),
+    placeholder="Todos os clientes"
 )
 
-# Aplicar filtros
-df_filtered = df[df["status"].isin(status_filter) & df["nome_cliente"].isin(client_filter)]
+type_filter = st.sidebar.multiselect(
+    "Filtrar por Tipo de Proposta",
+    options=get_distinct_values("proposal_type"),
+    placeholder="Todos os tipos"
+)
+
+date_range = st.sidebar.date_input("Período de Processamento", value=(), format="DD/MM/YYYY")
+
+# Filtros aplicados no próprio banco (cliente e tipo vazios = todos)
+filters = {
+    "status": status_filter,
+    "clients": client_filter or None,
+    "proposal_types": type_filter or None,
+    "date_from": date_range[0] if len(date_range) > 0 else None,
+    "date_to": date_range[1] if len(date_range) > 1 else None,
+}
 
 # --- KPIs ---
-total_proposals = len(df_filtered)
-total_value = df_filtered["valor_proposta"].sum()
-acceptance_rate = (df_filtered[df_filtered["status"] == 'aceita'].shape[0] / total_proposals * 100) if total_proposals > 0 else 0
+kpis = get_proposal_kpis(**filters)
+total_proposals = kpis["quantidade"]
+total_value = kpis["valor_total"]
+acceptance_rate = kpis["taxa_aceitacao"]
 
 col1, col2, col3 = st.columns(3)
 col1.metric("Total de Propostas", f"{total_proposals}")
@@ -68,13 +80,14 @@ col_chart1, col_chart2 = st.columns(2)
 
 with col_chart1:
     st.subheader("Propostas por Status")
-    fig_status = px.pie(df_filtered, names='status', title='Distribuição de Status das Propostas', hole=.3)
+    df_status = aggregate_proposals("status", **filters)
+    fig_status = px.pie(df_status, names='status', values='quantidade', title='Distribuição de Status das Propostas', hole=.3)
     st.plotly_chart(fig_status, use_container_width=True)
 
 with col_chart2:
     st.subheader("Valor por Cliente")
-    df_client_value = df_filtered.groupby('nome_cliente')['valor_proposta'].sum().sort_values(ascending=False)
-    fig_clients = px.bar(df_client_value, x=df_client_value.index, y='valor_proposta', title='Valor Total das Propostas por Cliente')
+    df_client_value = aggregate_proposals("nome_cliente", **filters, order_by_value=True, limit=TOP_CLIENTS)
+    fig_clients = px.bar(df_client_value, x='nome_cliente', y='valor_total', title=f'Valor Total das Propostas por Cliente (top {TOP_CLIENTS})')
     st.plotly_chart(fig_clients, use_container_width=True)
 
 # --- Tabela de Dados e Ações ---
@@ -84,11 +97,17 @@ tab_table, tab_status, tab_edit = st.tabs(["Visualizar Tabela", "Atualizar Statu
 
 with tab_table:
     st.subheader("Detalhes das Propostas")
-    # Criar uma cópia para exibição
-    df_display = df_filtered.copy()
-    # Selecionar colunas para exibir
-    cols_to_display = ['id', 'nome_cliente', 'valor_proposta', 'produto_servico', 'status', 'data_processamento']
-    st.dataframe(df_display[cols_to_display], use_container_width=True)
+    col_size, col_page = st.columns(2)
+    with col_size:
+        page_size = st.selectbox("Propostas por página", options=PAGE_SIZES, index=1, key="analise_page_size")
+    total_pages = max(1, -(-total_proposals // page_size))
+    with col_page:
+        page = st.number_input("Página", min_value=1, max_value=total_pages, step=1, key="analise_page")
+
+    # Apenas a página atual é lida do banco, sem os textos longos; depois, só as alterações
+    df_page = load_page("analise_tabela", filters, limit=page_size, offset=(page - 1) * page_size)
+    st.dataframe(df_page, use_container_width=True)
+    st.caption(f"Página {page} de {total_pages} ({total_proposals} propostas).")
 
 with tab_status:
     st.subheader("Atualizar Status da Proposta")
@@ -103,13 +122,12 @@ with tab_status:
         if st.button("Salvar Alteração de Status", key="save_status_button"):
             update_proposal_status(proposal_id_to_update, new_status)
             st.success(f"Status da proposta {proposal_id_to_update} atualizado para {new_status}!")
-            refresh_data() # Recarrega os dados para refletir a mudança
             st.rerun()
 
 with tab_edit:
     st.subheader("Editar Detalhes da Proposta")
 
-    selected_id_edit = st.selectbox("Selecione o ID da Proposta para Editar", options=df_filtered['id'].unique(), key="edit_id_selector")
+    selected_id_edit = st.selectbox("Selecione o ID da Proposta para Editar", options=df_page['id'].unique(), key="edit_id_selector")
 
     if selected_id_edit:
         details_to_edit = get_proposal_details(selected_id_edit)
@@ -144,7 +162,6 @@ with tab_edit:
                     }
                     update_proposal_details(selected_id_edit, updated_data)
                     st.success(f"Detalhes da proposta ID {selected_id_edit} atualizados com sucesso!")
-                    refresh_data() # Recarrega os dados para refletir a mudança
                     st.rerun()
         else:
             st.warning("Não foi possível encontrar os detalhes para o ID selecionado para edição.")
@@ -0,0 +1,134 @@
+import sys
+import os
+
+# Adiciona o diretório raiz do projeto ao sys.path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+import requests
+
+from src.core import metrics
+
+# --- Configuração da Página ---
+st.set_page_config(
+    page_title="Métricas do Pipeline",
+    page_icon="⏱️",
+    layout="wide"
+)
+
+METRICS_URL = os.getenv("METRICS_URL", f"http://127.0.0.1:{metrics.METRICS_PORT}/metrics")
+
+# --- Funções Auxiliares ---
+def load_samples(source):
+    """Lê as amostras do exportador do serviço de monitoramento ou do próprio processo do Streamlit."""
+    if source == "streamlit":
+        return metrics.parse_prometheus_text(metrics.registry.render_prometheus())
+    try:
+        response = requests.get(METRICS_URL, timeout=3)
+        response.raise_for_status()
+        return metrics.parse_prometheus_text(response.text)
+    except requests.exceptions.RequestException as e:
+        st.error(f"Não foi possível ler as métricas em {METRICS_URL}: {e}")
+        return []
+
+def samples_to_dataframe(samples):
+    rows = [{"metrica": name, **labels, "valor": value} for name, labels, value in samples]
+    return pd.DataFrame(rows)
+
+def histogram_summary(df, metric, label):
+    """Resume um histograma por rótulo: contagem, média e p95 estimado pelos buckets."""
+    rows = []
+    counts = df[df["metrica"] == f"{metric}_count"]
+    for _, row in counts.iterrows():
+        key = row.get(label)
+        count = row["valor"]
+        total = df[(df["metrica"] == f"{metric}_sum") & (df[label] == key)]["valor"].sum()
+        buckets = df[(df["metrica"] == f"{metric}_bucket") & (df[label] == key) & (df["le"] != "+Inf")].copy()
+        buckets["le"] = buckets["le"].astype(float)
+        buckets = buckets.sort_values("le")
+        reached = buckets[buckets["valor"] >= 0.95 * count]
+        p95 = reached["le"].iloc[0] if count and not reached.empty else None
+        rows.append({label: key, "contagem": int(count), "media": total / count if count else 0.0, "p95_aprox": p95})
+    return pd.DataFrame(rows)
+
+# --- Título e Fonte dos Dados ---
+st.title("⏱️ Métricas do Pipeline")
+st.markdown("Tempo gasto em cada etapa, falhas e latência da IA. Os dados vêm do exportador Prometheus do serviço de monitoramento.")
+
+source_label = st.radio(
+    "Fonte das métricas",
+    options=["Serviço de monitoramento (main.py)", "Uploads feitos neste painel"],
+    horizontal=True,
+)
+source = "servico" if source_label.startswith("Serviço") else "streamlit"
+st.button("Atualizar Métricas")
+
+df = samples_to_dataframe(load_samples(source))
+
+if df.empty:
+    st.info("Nenhuma métrica coletada ainda.")
+    st.stop()
+
+for column in ["stage", "task", "resultado", "le"]:
+    if column not in df.columns:
+        df[column] = None
+
+# --- KPIs ---
+processed = df[df["metrica"] == "propostas_arquivos_processados_total"]
+failures = df[df["metrica"] == "propostas_falhas_total"]
+
+col1, col2, col3 = st.columns(3)
+col1.metric("Arquivos com Sucesso", int(processed[processed["resultado"] == "sucesso"]["valor"].sum()))
+col2.metric("Arquivos com Erro", int(processed[processed["resultado"] == "erro"]["valor"].sum()))
+col3.metric("Falhas em Etapas", int(failures["valor"].sum()))
+
+st.markdown("---")
+
+# --- Gráficos ---
+col_chart1, col_chart2 = st.columns(2)
+
+with col_chart1:
+    st.subheader("Duração por Etapa")
+    stages = histogram_summary(df, "propostas_etapa_duracao_segundos", "stage")
+    if stages.empty:
+        st.info("Sem medições de etapas.")
+    else:
+        stages["media_ms"] = stages["media"] * 1000
+        fig_stages = px.bar(stages, x="stage", y="media_ms", title="Duração média por etapa (ms)", hover_data=["contagem", "p95_aprox"])
+        st.plotly_chart(fig_stages, use_container_width=True)
+
+with col_chart2:
+    st.subheader("Falhas por Etapa")
+    if failures.empty:
+        st.success("Nenhuma falha registrada.")
+    else:
+        fig_failures = px.bar(failures, x="stage", y="valor", title="Falhas por etapa")
+        st.plotly_chart(fig_failures, use_container_width=True)
+
+col_chart3, col_chart4 = st.columns(2)
+
+with col_chart3:
+    st.subheader("Latência da IA por Tarefa")
+    llm = histogram_summary(df, "propostas_ia_latencia_segundos", "task")
+    if llm.empty:
+        st.info("Nenhuma chamada à IA registrada.")
+    else:
+        llm["media_ms"] = llm["media"] * 1000
+        fig_llm = px.bar(llm, x="task", y="media_ms", title="Latência média da IA (ms)", hover_data=["contagem", "p95_aprox"])
+        st.plotly_chart(fig_llm, use_container_width=True)
+
+with col_chart4:
+    st.subheader("Tamanho dos Prompts")
+    prompts = histogram_summary(df, "propostas_ia_prompt_tokens", "task")
+    if prompts.empty:
+        st.info("Nenhum prompt registrado.")
+    else:
+        fig_prompts = px.bar(prompts, x="task", y="media", title="Tokens estimados por prompt (média)", hover_data=["contagem", "p95_aprox"])
+        st.plotly_chart(fig_prompts, use_container_width=True)
+
+with st.expander("Ver todas as amostras"):
+    st.dataframe(df, use_container_width=True)
@@ -12,7 +12,9 @@ if project_root not in sys.path:
 from src.core import pdf_extractor
 from src.core import proposal_processor as analysis_processor
 from src.core import database_service as database
-from src.core import notification_service as notifier
+from src.core import notification_dispatcher
+from src.core import metrics
+from src.core.resilience import TransientAIError
 
 # --- Configuração da Página ---
 st.set_page_config(
@@ -24,8 +26,36 @@ st.set_page_config(
 st.title("📄 Processar Nova Proposta Comercial")
 st.markdown("Faça o upload de um arquivo PDF de proposta para que a IA possa extrair, resumir e prever o status.")
 
+# --- Função para exibir uma proposta já registrada ---
+def show_existing_proposal(existing):
+    st.info(
+        f"Esta proposta já foi processada (ID {existing['id']}, arquivo '{existing.get('nome_arquivo')}'). "
+        "Exibindo o resultado registrado, sem uma nova análise."
+    )
+    st.subheader("Resultados da Análise:")
+    st.write(f"**Cliente:** {existing.get('nome_cliente', 'N/A')}")
+    st.write(f"**Valor da Proposta:** R$ {existing.get('valor_proposta') or 0.0:,.2f}")
+    st.write(f"**Produto/Serviço:** {existing.get('produto_servico', 'N/A')}")
+    st.write(f"**Tipo de Proposta:** {existing.get('proposal_type', 'N/A')}")
+    st.write(f"**Status:** **{(existing.get('status') or 'pendente').upper()}**")
+
+    st.markdown("---")
+    st.subheader("Resumo Gerado pela IA:")
+    st.info(existing.get('resumo_ia') or "Resumo não disponível.")
+
+    with st.expander("Ver todos os dados registrados (JSON)"):
+        st.json(existing)
+
 # --- Função para processar o arquivo ---
 def process_uploaded_proposal(uploaded_file):
+    # Verifica se o mesmo PDF já foi processado antes de qualquer extração ou chamada à IA
+    content_hash = database.compute_content_hash(uploaded_file.getbuffer())
+    existing = database.get_proposal_by_hash(content_hash)
+    if existing:
+        metrics.files_processed.inc(resultado="duplicada")
+        show_existing_proposal(existing)
+        return
+
     st.info(f"Processando o arquivo: {uploaded_file.name}...")
     
     # Salvar o arquivo temporariamente para que o PyMuPDF possa abri-lo
@@ -38,37 +68,43 @@ def process_uploaded_proposal(uploaded_file):
 
     try:
         # Etapa 1: Extrair texto
-        with st.spinner("1/4 - Extraindo texto do PDF..."):
-            text = pdf_extractor.extract_text_from_pdf(pdf_path)
+        with st.spinner("1/3 - Extraindo texto do PDF..."):
+            with metrics.timed("extracao"):
+                text = pdf_extractor.extract_text_from_pdf(pdf_path)
             if not text or len(text) < 50:
+                metrics.stage_failures.inc(stage="extracao")
                 st.error("Falha ao extrair texto do PDF. O arquivo pode estar em branco, ser uma imagem ou corrompido.")
                 return
-        st.success("1/4 - Texto extraído com sucesso!")
+        st.success("1/3 - Texto extraído com sucesso!")
 
-        # Etapa 2: Extrair dados e gerar resumo
-        with st.spinner("2/4 - Analisando e gerando resumo inteligente..."):
-            structured_data = analysis_processor.extract_structured_data(text)
+        # Etapa 2: Extrair dados, gerar resumo e prever aceitação (uma única chamada à IA)
+        with st.spinner("2/3 - Analisando, gerando resumo e prevendo aceitação..."):
+            with metrics.timed("analise"):
+                structured_data = analysis_processor.analyze_proposal(text)
             if not structured_data:
+                metrics.stage_failures.inc(stage="analise")
                 st.error("Falha ao extrair dados estruturados. Verifique o console para mais detalhes.")
                 return
-            
-            summary = analysis_processor.generate_summary(structured_data)
-            structured_data['resumo_ia'] = summary
-            structured_data['nome_arquivo'] = uploaded_file.name
-            
-        st.success("2/4 - Dados extraídos e resumo gerado!")
 
-        # Etapa 3: Prever aceitação
-        with st.spinner("3/4 - Prevendo aceitação da proposta..."):
-            prediction = analysis_processor.predict_acceptance(structured_data)
+            summary = structured_data['resumo_ia']
+            prediction = structured_data.pop('previsao_aceitacao', 'pendente')
             structured_data['status'] = prediction # Atualiza o status com a previsão
-        st.success("3/4 - Previsão de aceitação concluída!")
+            structured_data['nome_arquivo'] = uploaded_file.name
+            structured_data['content_hash'] = content_hash
+        st.success("2/3 - Dados extraídos, resumo gerado e previsão concluída!")
 
-        # Etapa 4: Armazenar no banco de dados
-        with st.spinner("4/4 - Salvando no banco de dados e enviando notificação..."):
-            database.insert_proposal(structured_data)
-            notifier.send_notification(structured_data)
-        st.success("4/4 - Informações salvas e notificação enviada!")
+        # Etapa 3: Armazenar no banco de dados
+        with st.spinner("3/3 - Salvando no banco de dados e enviando notificação..."):
+            with metrics.timed("banco"):
+                structured_data['id'] = database.insert_proposal(structured_data, extracted_text=text)
+            with metrics.timed("notificacao"):
+                notification_dispatcher.enqueue_notification(
+                    structured_data,
+                    st.session_state.get('whatsapp_phone_number'),
+                    st.session_state.get('whatsapp_api_key'),
+                )
+            metrics.files_processed.inc(resultado="sucesso")
+        st.success("3/3 - Informações salvas e notificação enviada para a fila de envio!")
         st.success("Proposta processada e registrada com sucesso!")
 
         st.subheader("Resultados da Análise:")
@@ -85,6 +121,8 @@ def process_uploaded_proposal(uploaded_file):
         with st.expander("Ver todos os dados extraídos (JSON)"):
             st.json(structured_data)
 
+    except TransientAIError as e:
+        st.warning(f"A IA está temporariamente indisponível ({e}). Tente novamente em alguns instantes.")
     except Exception as e:
         st.error(f"Ocorreu um erro inesperado durante o processamento: {e}")
         st.exception(e) # Exibe o traceback completo para depuração
@@ -0,0 +1,26 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.core.rate_limiter import RateLimiter
+
+
+def test_quota_is_shared_between_threads_and_event_loops():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=0)
+    threads = [threading.Thread(target=limiter.acquire) for _ in range(30)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for _ in range(30):
+        asyncio.run(limiter.acquire_async())
+    # A cota do minuto acabou: a próxima requisição, venha de onde vier, espera a reposição
+    assert limiter._reserve(1) == pytest.approx(1.0, abs=0.1)
+
+
+def test_pending_reservations_queue_up():
+    limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=600)
+    assert limiter._reserve(600) == 0
+    assert limiter._reserve(10) == pytest.approx(1.0, abs=0.1)
+    assert limiter._reserve(10) == pytest.approx(2.0, abs=0.1)
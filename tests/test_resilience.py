@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+import pytest
+
+from src.core.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, call_with_retry, call_with_retry_async
+
+
+def _half_open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01, name="teste")
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    return breaker
+
+
+def _fail_with(exc):
+    def func():
+        raise exc
+    return func
+
+
+def test_non_transient_probe_error_closes_circuit():
+    breaker = _half_open_breaker()
+    with pytest.raises(ValueError):
+        call_with_retry(_fail_with(ValueError("resposta inválida")), breaker=breaker)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert call_with_retry(lambda: "ok", breaker=breaker) == "ok"
+
+
+def test_cancelled_probe_releases_half_open_slot():
+    breaker = _half_open_breaker()
+
+    async def cancelled():
+        raise asyncio.CancelledError
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(call_with_retry_async(cancelled, breaker=breaker))
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert call_with_retry(lambda: "ok", breaker=breaker) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_transient_probe_failure_reopens_circuit():
+    breaker = _half_open_breaker()
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(_fail_with(TimeoutError()), breaker=breaker, policy=RetryPolicy(max_attempts=2, base_delay=0))
+    assert breaker.state == CircuitBreaker.OPEN